@@ -0,0 +1,195 @@
+""" Benchmarks for the team pipeline on synthetic rosters. Generates import_data-shaped rosters of chosen sizes and
+tie rates, times each stage (scoring every team, the Excel export, importing counting scores, duplicate detection
+and the team bar chart) and records wall time, peak memory and throughput as JSON so runs can be compared.
+
+Run from the repository root, e.g. python -m gym.bench --sizes 20 28 40 --output bench.json """
+import argparse
+from datetime import datetime, timezone
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from gym import gym
+from gym.engine import EVENTS
+from gym.store import read_team_results, write_team_results
+
+STAGES = ['top_team_scores', 'write_team_scores_to_excel', 'import_counting_scores', 'find_same_3up',
+          'team_scores_bar_chart']
+# stages that build per-routine Python/pandas objects are skipped above these team counts by default
+MAX_TEAMS = {'write_team_scores_to_excel': 5 * 10 ** 4, 'import_counting_scores': 10 ** 6, 'team_scores_bar_chart': 10 ** 6}
+# event score distributions (mean, standard deviation) roughly matching a senior national field
+_EVENT_SCORES = {'Vault': (13.9, 0.5), 'Bars': (13.5, 0.7), 'Beam': (13.3, 0.7), 'Floor': (13.3, 0.6)}
+
+
+def synthetic_roster(num_athletes, tie_rate=0.0, seed=0):
+    """ Generates a roster shaped like import_data output (day 1, day 2 and average scores per event and AA,
+    plus a color per athlete), sorted by descending AA average. With tie_rate, that fraction of event scores
+    is copied from another athlete's score on the same event and day, so ties at counting places are common. """
+    rng = np.random.default_rng(seed)
+    AA = pd.DataFrame({'Name': [f'Athlete {i+1:03d}' for i in range(num_athletes)]})
+    for day in ['day1', 'day2']:
+        for event, (mean, spread) in _EVENT_SCORES.items():
+            scores = np.round(rng.normal(mean, spread, num_athletes), 3)
+            tied = np.flatnonzero(rng.random(num_athletes) < tie_rate)
+            scores[tied] = scores[rng.integers(0, num_athletes, len(tied))]
+            AA[f'{event}_{day}'] = scores
+        AA[f'AA_{day}'] = AA[[f'{event}_{day}' for event in EVENTS]].sum(axis=1)
+    AA['Color'] = [f'C{i % 10}' for i in range(num_athletes)]
+    for event in ['AA'] + EVENTS:
+        AA[f'{event}_avg'] = AA[[f'{event}_day1', f'{event}_day2']].mean(axis=1)
+    AA.sort_values(by='AA_avg', ascending=False, inplace=True)
+
+    return AA
+
+
+def run_stage(func, repeat=1, memory=True):
+    """ Times func (best of repeat runs) and, optionally, measures its peak traced memory in one extra run
+    (tracing slows Python-heavy stages, so it is kept out of the timed runs). Returns seconds, peak MB, and
+    the last return value. """
+    seconds = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        seconds = min(seconds, time.perf_counter() - start)
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+    return seconds, peak_mb, value
+
+
+def bench_roster(AA, stages=STAGES, max_teams=MAX_TEAMS, repeat=1, memory=True, occ='avg', sheet_name='Average'):
+    """ Runs the selected pipeline stages for one roster inside the current working directory (which needs
+    gym/data/teams and gym/figures/Team). Returns one record per stage. """
+    num_teams = math.comb(len(AA), 5)
+    records = []
+    # outputs of earlier stages that later stages consume
+    state = {}
+
+    def setup(stage):
+        if stage in ('import_counting_scores', 'find_same_3up', 'team_scores_bar_chart') and 'stored' not in state:
+            write_team_results(sheet_name, gym.score_all_teams(AA, occ))
+            state['stored'] = True
+        if stage == 'write_team_scores_to_excel' and 'decoded' not in state:
+            state['decoded'] = gym.top_team_scores(AA, occ)
+        if stage == 'team_scores_bar_chart' and 'scores' not in state:
+            state['scores'] = gym.import_counting_scores(sheet_name)[0]
+
+    for stage in stages:
+        record = {'athletes': len(AA), 'teams': num_teams, 'stage': stage}
+        if num_teams > max_teams.get(stage, math.inf):
+            records.append({**record, 'skipped': f'more than {max_teams[stage]} teams'})
+            continue
+        setup(stage)
+        if stage == 'top_team_scores':
+            func = lambda: gym.top_team_scores(AA, occ)
+        elif stage == 'write_team_scores_to_excel':
+            def func():
+                # each run writes a fresh workbook so sheets do not pile up
+                if os.path.exists('./gym/data/Highest Scoring Teams.xlsx'):
+                    os.remove('./gym/data/Highest Scoring Teams.xlsx')
+                _, counting_scores, counting_names = state['decoded']
+                return gym.write_team_scores_to_excel(counting_names, counting_scores, sheet_name)
+        elif stage == 'import_counting_scores':
+            func = lambda: gym.import_counting_scores(sheet_name)
+        elif stage == 'find_same_3up':
+            func = lambda: gym.find_same_3up(read_team_results(sheet_name))
+        elif stage == 'team_scores_bar_chart':
+            try:
+                from matplotlib import pyplot as plt
+                from gym import plot
+            except ImportError as e:
+                records.append({**record, 'skipped': f'plotting unavailable ({e})'})
+                continue
+            name_color = AA.set_index('Name')['Color'].to_dict()
+
+            def func():
+                top_team_ids = plot.team_scores_bar_chart(state['scores'].copy(), sheet_name, name_color=name_color)
+                plt.close('all')
+                return top_team_ids
+        else:
+            raise ValueError(f'unknown stage {stage}')
+        seconds, peak_mb, _ = run_stage(func, repeat, memory)
+        records.append({**record, 'seconds': seconds, 'peak_mb': peak_mb, 'teams_per_sec': num_teams / seconds})
+
+    return records
+
+
+def _environment():
+    """ Versions and commit the results were measured with. """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'time': datetime.now(timezone.utc).isoformat(), 'commit': commit, 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+
+def run_benchmarks(sizes=(20, 28, 40, 60), tie_rates=(0.0, 0.3), stages=STAGES, max_teams=MAX_TEAMS, repeat=1,
+                   memory=True, seed=0):
+    """ Benchmarks every roster size and tie rate in a scratch directory (so real results and figures are
+    never overwritten). Returns a dictionary of environment details and per-stage records. """
+    records = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.makedirs(os.path.join(scratch, 'gym', 'data', 'teams'))
+        os.makedirs(os.path.join(scratch, 'gym', 'figures', 'Team'))
+        os.chdir(scratch)
+        try:
+            for size in sizes:
+                for tie_rate in tie_rates:
+                    AA = synthetic_roster(size, tie_rate, seed)
+                    for record in bench_roster(AA, stages, max_teams, repeat, memory):
+                        records.append({**record, 'tie_rate': tie_rate})
+                        print(json.dumps(records[-1]), flush=True)
+        finally:
+            os.chdir(cwd)
+
+    return {'environment': _environment(), 'results': records}
+
+
+def compare_benchmarks(previous, current):
+    """ Matches records of two benchmark runs by roster size, tie rate and stage. Returns a dataframe with
+    both wall times and their ratio (above 1 is slower than before). """
+    def frame(run):
+        return pd.DataFrame(run['results']).dropna(subset=['seconds']).set_index(['athletes', 'tie_rate', 'stage'])['seconds']
+
+    times = pd.concat({'previous': frame(previous), 'current': frame(current)}, axis=1).dropna()
+    times['ratio'] = times['current'] / times['previous']
+
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the team pipeline on synthetic rosters.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 28, 40, 60])
+    parser.add_argument('--tie-rates', type=float, nargs='+', default=[0.0, 0.3])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--max-teams', type=int, help='skip every stage above this many teams (overrides defaults)')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run for peak memory')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', help='earlier output to compare wall times against')
+    args = parser.parse_args(argv)
+
+    max_teams = MAX_TEAMS if args.max_teams is None else {stage: args.max_teams for stage in STAGES}
+    run = run_benchmarks(args.sizes, args.tie_rates, args.stages, max_teams, args.repeat, not args.no_memory, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(run, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare_benchmarks(json.load(f), run).to_string())
+
+
+if __name__ == '__main__':
+    main()
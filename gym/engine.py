@@ -0,0 +1,585 @@
+""" Array-based team scoring engine. Encodes a roster as an athlete x event score matrix and every team (5 members
+by default) as a row of athlete indices, so the counting scores of all teams can be found in bulk with NumPy. """
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+import math
+import os
+import numpy as np
+import pandas as pd
+
+EVENTS = ['Vault', 'Bars', 'Beam', 'Floor']
+# number of teams scored per vectorized step (bounds the size of temporary arrays)
+CHUNK_SIZE = 1 << 12
+# team scores are kept in fixed point (hundredths of a point); counting scores stay exact floats, since averaged
+# and weighted occasions have more decimals than a fixed scale holds
+TEAM_SCORE_SCALE = 100
+# number of teams per chunk when streaming results instead of holding every team in memory
+STREAM_CHUNK_SIZE = 1 << 16
+# slack applied to score bounds so teams that could round to a tied 2-decimal team score are never pruned
+_ROUNDING_MARGIN = 0.011
+
+
+@dataclass
+class TeamResults:
+    """ Scored teams as compact arrays, one row per team: its Team ID, members (ascending athlete codes),
+    the athletes counting on each event in rank order (teams x events x counting scores per event), their exact
+    scores (float64) and the team score in hundredths (int32). Athlete codes index into names, which is
+    only used to decode for plots and export. """
+    team_ids: np.ndarray
+    members: np.ndarray
+    athletes: np.ndarray
+    scores: np.ndarray
+    team_scores: np.ndarray
+    names: np.ndarray = None
+
+    def __len__(self):
+        return len(self.team_ids)
+
+    def take(self, rows):
+        """ Returns the results for only the given rows. """
+        return TeamResults(self.team_ids[rows], self.members[rows], self.athletes[rows], self.scores[rows],
+                           self.team_scores[rows], self.names)
+
+    def team_score_values(self):
+        """ Team scores as floats rounded to 2 decimals. """
+        return self.team_scores / TEAM_SCORE_SCALE
+
+    def counting_score_values(self):
+        """ Counting scores as floats. """
+        return np.asarray(self.scores)
+
+    def teams_frame(self):
+        """ Decodes to a dataframe with Team ID, team score, and member names (the Teams CSV layout). """
+        teams = pd.DataFrame({'Team ID': self.team_ids, 'Team Score': self.team_score_values()})
+        for i in range(self.members.shape[1]):
+            teams[f'Member {i+1}'] = self.names[self.members[:, i]]
+
+        return teams
+
+    def counting_frame(self):
+        """ Decodes to the long-format dataframe of counting scores (Team ID, Event, Score_Rank, Name, Score)
+        with one row per counting routine. Names and events are categorical. """
+        num_teams, num_events, count = self.athletes.shape
+        return pd.DataFrame({'Team ID': np.repeat(self.team_ids, num_events * count),
+                             'Event': pd.Categorical.from_codes(np.tile(np.repeat(np.arange(num_events), count), num_teams), categories=EVENTS),
+                             'Score_Rank': np.tile(np.arange(1, count + 1), num_teams * num_events),
+                             'Name': pd.Categorical.from_codes(np.ravel(self.athletes), categories=self.names),
+                             'Score': np.ravel(self.counting_score_values())})
+
+    @staticmethod
+    def concat(parts):
+        """ Joins results in the given order. """
+        return TeamResults(*(np.concatenate([getattr(part, field) for part in parts])
+                             for field in ['team_ids', 'members', 'athletes', 'scores', 'team_scores']), parts[0].names)
+
+
+@dataclass
+class Occasion:
+    """ A custom occasion combining per-day score columns (by suffix, e.g. ['day1', 'day2']): a weighted sum with
+    the given weights (equal weights by default, i.e. the average) or, with how='best', each athlete's best
+    score on each event among the days. """
+    days: list
+    weights: list = None
+    how: str = 'weighted'
+
+    def matrix(self, AA):
+        """ Athlete x event matrix of the occasion's scores, in the same row order as AA. """
+        days = np.stack([score_matrix(AA, day) for day in self.days])
+        if self.how == 'best':
+            return days.max(axis=0)
+        if self.how != 'weighted':
+            raise ValueError(f'unknown occasion type {self.how!r}')
+        weights = np.full(len(self.days), 1 / len(self.days)) if self.weights is None else np.asarray(self.weights, dtype=float)
+        return np.tensordot(weights, days, axes=1)
+
+
+@dataclass(frozen=True)
+class TeamFormat:
+    """ A team competition format: teams of team_size members put up to up athletes on each event and the best
+    count of their scores count. Teams are assumed to put up their best athletes on each event, so the counting
+    scores are a team's top count on each event and up only has to lie between count and team_size. """
+    team_size: int = 5
+    up: int = 3
+    count: int = 3
+
+    def __post_init__(self):
+        if not 1 <= self.count <= self.up <= self.team_size:
+            raise ValueError(f'invalid team format {self}: need 1 <= count <= up <= team_size')
+
+    def __str__(self):
+        return f'{self.team_size} members, {self.up}-up {self.count}-count'
+
+
+# international team final and qualification formats
+TEAM_FINAL = TeamFormat(5, 3, 3)
+QUALIFICATION = TeamFormat(5, 4, 3)
+
+
+def score_matrix(AA, occ):
+    """ Returns an athlete x event matrix of scores for the occasion (day1, day2, avg or an Occasion),
+    with athletes in the same row order as AA. """
+    if isinstance(occ, Occasion):
+        return occ.matrix(AA)
+    return AA[[f'{event}_{occ}' for event in EVENTS]].to_numpy(dtype=float)
+
+
+def _cumulative_counts(num_athletes, team_size):
+    """ For each size j <= team_size, counts the j-member combinations of num_athletes whose first
+    member is below x (for every x), which is what lexicographic ranking/unranking steps over. """
+    return {j: np.cumsum([0] + [math.comb(num_athletes - 1 - b, j - 1) for b in range(num_athletes)], dtype=np.int64)
+            for j in range(1, team_size + 1)}
+
+
+def unrank_combinations(ranks, num_athletes, team_size=5):
+    """ Converts lexicographic ranks (the order of itertools.combinations) into rows of athlete indices. """
+    cum = _cumulative_counts(num_athletes, team_size)
+    remainder = np.array(ranks, dtype=np.int64, copy=True)
+    combos = np.empty((len(remainder), team_size), dtype=np.uint8 if num_athletes <= 256 else np.int64)
+    for p in range(team_size):
+        j = team_size - p
+        # first member of the remaining j-combination, then the rank within combinations starting with it
+        first = np.searchsorted(cum[j], remainder, side='right') - 1
+        combos[:, p] = first
+        remainder -= cum[j][first]
+        if j > 1:
+            remainder += cum[j - 1][first + 1]
+
+    return combos
+
+
+def rank_combinations(combos, num_athletes):
+    """ Inverse of unrank_combinations: returns the lexicographic rank (Team ID) of each row of
+    ascending athlete indices. """
+    combos = np.asarray(combos, dtype=np.int64).reshape(-1, np.shape(combos)[-1])
+    team_size = combos.shape[1]
+    cum = _cumulative_counts(num_athletes, team_size)
+    ranks = np.zeros(len(combos), dtype=np.int64)
+    start = np.zeros(len(combos), dtype=np.int64)
+    for p in range(team_size):
+        j = team_size - p
+        ranks += cum[j][combos[:, p]] - cum[j][start]
+        start = combos[:, p] + 1
+
+    return ranks
+
+
+def team_combinations(num_athletes, team_size=5, start=0, stop=None):
+    """ Returns an index array with one row per team (ascending athlete indices) for Team IDs
+    start to stop, in the same order as itertools.combinations. """
+    if stop is None:
+        stop = math.comb(num_athletes, team_size)
+    return unrank_combinations(np.arange(start, stop, dtype=np.int64), num_athletes, team_size)
+
+
+def event_rankings(scores):
+    """ Ranks athletes on each event (0 = best, ties going to the lower athlete index).
+    Returns the athlete x event rank matrix and the rank x event matrix of athletes. """
+    num_athletes = len(scores)
+    athlete_at_rank = np.argsort(-scores, axis=0, kind='stable')
+    ranks = np.empty(scores.shape, dtype=np.int16)
+    np.put_along_axis(ranks, athlete_at_rank, np.arange(num_athletes, dtype=np.int16)[:, np.newaxis], axis=0)
+
+    return ranks, athlete_at_rank
+
+
+def descending_order(values):
+    """ Orders the last axis of values from highest to lowest exactly as
+    DataFrame.sort_values(ascending=False) does (reverse, quicksort, reverse), so ties land where the
+    original per-team pandas sort put them. """
+    width = values.shape[-1]
+    order = np.argsort(values[..., ::-1], axis=-1, kind='quicksort')
+    return (width - 1 - order)[..., ::-1]
+
+
+# optimal sorting network for 5 elements (pairs of positions to compare-exchange)
+_SORT_NETWORK_5 = [(0, 3), (1, 4), (0, 2), (1, 3), (0, 1), (2, 4), (1, 2), (3, 4), (2, 3)]
+
+
+def _sort_members(columns):
+    """ Sorts values across a list of equally shaped arrays (one per team member), element-wise, in place. """
+    if len(columns) == 5:
+        network = _SORT_NETWORK_5
+    else:
+        # odd-even transposition network works for any team size
+        network = [(i, i + 1) for rnd in range(len(columns)) for i in range(rnd % 2, len(columns) - 1, 2)]
+    for a, b in network:
+        lo = np.minimum(columns[a], columns[b])
+        columns[b] = np.maximum(columns[a], columns[b])
+        columns[a] = lo
+
+    return columns
+
+
+def _rank_tables(scores):
+    """ Per-event rankings of one occasion's score matrix: the scores themselves, each athlete's rank,
+    the athlete at each rank and the score at each rank. """
+    ranks, athlete_at_rank = event_rankings(scores)
+    return scores, ranks, athlete_at_rank, np.take_along_axis(scores, athlete_at_rank, axis=0)
+
+
+def _sorted_member_ranks(ranks, members):
+    """ Per-event ranks of each member of a chunk of teams, sorted so the best ranks on each event come first
+    (a list with one teams x events array per place). Shared by every count scored for the same teams. """
+    member_ranks = [np.take(ranks, members[:, i], axis=0) for i in range(members.shape[1])]
+    return _sort_members(member_ranks)
+
+
+def _score_chunk(tables, members, sorted_ranks, counting_ids, counting_scores, team_scores):
+    """ Scores one chunk of teams (rows of member indices) for one occasion, counting as many scores per event
+    as counting_ids has ranks, and fills the output arrays. """
+    scores, ranks, athlete_at_rank, score_at_rank = tables
+    count = counting_ids.shape[2]
+    # one place past the counting ones shows whether a tie decides who counts
+    depth = min(count + 1, members.shape[1])
+    # flat offsets of each event column, so (rank, event) lookups are a single take
+    event_idx = np.arange(len(EVENTS))[:, np.newaxis]
+    top = np.stack(sorted_ranks[:depth], axis=2)
+    flat = top.astype(np.intp) * len(EVENTS) + event_idx
+    # one row per (team, event) pair from here on
+    top_scores = np.take(score_at_rank, flat).reshape(-1, depth)
+    top_ids = np.take(athlete_at_rank, flat).reshape(-1, depth)
+    # tied scores at or above the last counting place are ordered like the pandas sort instead
+    tied = np.flatnonzero((top_scores[:, :-1] == top_scores[:, 1:]).any(axis=1))
+    if len(tied):
+        tied_members = np.take(members, tied // len(EVENTS), axis=0)
+        # member codes may be uint8, so widen them before the arithmetic to keep it from wrapping
+        tied_scores = np.take(scores, tied_members.astype(np.intp) * len(EVENTS) + (tied % len(EVENTS))[:, np.newaxis])
+        order = descending_order(tied_scores)[:, :count]
+        top_scores[tied, :count] = np.take_along_axis(tied_scores, order, axis=1)
+        top_ids[tied, :count] = np.take_along_axis(tied_members, order, axis=1)
+    top_scores = top_scores.reshape(-1, len(EVENTS), depth)[..., :count]
+    counting_ids[:] = top_ids.reshape(-1, len(EVENTS), depth)[..., :count]
+    counting_scores[:] = top_scores
+    team_scores[:] = sum_team_scores(top_scores)
+
+
+def sum_team_scores(counting):
+    """ Team scores in hundredths from counting scores (teams x events x ranks): sums rank by rank, then event
+    by event, in the same order as the original per-team loop, then rounds to 2 decimals (rint of hundredths
+    is exactly what np.round(total, 2) computes). """
+    event_scores = counting[:, :, 0]
+    for rank in range(1, counting.shape[2]):
+        event_scores = event_scores + counting[:, :, rank]
+    total = event_scores[:, 0]
+    for e in range(1, len(EVENTS)):
+        total = total + event_scores[:, e]
+
+    return np.rint(total * TEAM_SCORE_SCALE).astype(np.int32)
+
+
+def _score_counts(tables, combos, team_ids=None, counts=(3,), chunk_size=CHUNK_SIZE):
+    """ Scores every team for each occasion's rank tables and each number of counting scores in a single pass
+    over the teams: each chunk of member rows is sliced and its member ranks sorted once per occasion, then
+    shared by every count. Returns a dictionary of count to a list of TeamResults, one per occasion. """
+    num_teams = combos.shape[0]
+    if team_ids is None:
+        team_ids = np.arange(num_teams, dtype=np.int64)
+    outputs = {count: [(np.empty((num_teams, len(EVENTS), count), dtype=combos.dtype),
+                        np.empty((num_teams, len(EVENTS), count), dtype=np.float64),
+                        np.empty(num_teams, dtype=np.int32)) for _ in tables] for count in counts}
+    for lo in range(0, num_teams, chunk_size):
+        hi = min(lo + chunk_size, num_teams)
+        members = combos[lo:hi]
+        for i, table in enumerate(tables):
+            sorted_ranks = _sorted_member_ranks(table[1], members)
+            for count in counts:
+                counting_ids, counting_scores, team_scores = outputs[count][i]
+                _score_chunk(table, members, sorted_ranks, counting_ids[lo:hi], counting_scores[lo:hi], team_scores[lo:hi])
+
+    return {count: [TeamResults(team_ids, combos, *output) for output in occasion_outputs]
+            for count, occasion_outputs in outputs.items()}
+
+
+def score_teams_multi(score_matrices, combos, team_ids=None, chunk_size=CHUNK_SIZE, count=3):
+    """ Scores every team for several occasions (one score matrix each) in a single pass over the teams: each
+    chunk of member rows is sliced once and shared, so every extra occasion only adds its own ranking and
+    arithmetic. Returns a list of TeamResults, one per occasion. """
+    tables = [_rank_tables(scores) for scores in score_matrices]
+    return _score_counts(tables, combos, team_ids, [count], chunk_size)[count]
+
+
+def score_teams(scores, combos, team_ids=None, chunk_size=CHUNK_SIZE, count=3):
+    """ Finds the top count scores (3 by default, i.e. 3-up, 3-count) on each event for every team along with
+    the indices of the athletes who scored them, with ties broken the same way as the original pandas sort.
+    Team IDs default to the row number. Returns TeamResults. """
+    return score_teams_multi([scores], combos, team_ids, chunk_size, count)[0]
+
+
+def counting_team_scores(scores, athletes):
+    """ Team scores in hundredths from counting athlete codes (teams x events x ranks), summed in the same
+    order as score_teams so the rounding matches. """
+    return sum_team_scores(np.take(scores, athletes.astype(np.intp) * len(EVENTS) + np.arange(len(EVENTS))[:, np.newaxis]))
+
+
+def swap_team_scores(scores, members, count=3):
+    """ Scores every one-member replacement of the given teams (rows of member indices) in bulk. Returns the
+    teams x members x athletes array of team scores with the jth member replaced by each athlete (NaN for
+    athletes already on the team) and the teams' own scores, both as sums of the counting scores (not rounded
+    to 2 decimals). Each team's top count + 1 scores on every event are found once from the shared
+    rankings; without a member, an event keeps the others among them and a replacement adds whatever it beats
+    the lowest remaining counting score by. """
+    members = np.asarray(members)
+    num_teams, team_size = members.shape
+    event_idx = np.arange(len(EVENTS))[:, np.newaxis]
+    scores, ranks, athlete_at_rank, _ = _rank_tables(np.asarray(scores, dtype=float))
+    depth = min(count + 1, team_size)
+    top_ids = athlete_at_rank[np.stack(_sorted_member_ranks(ranks, members)[:depth], axis=2), event_idx]
+    # score at each of the top count + 1 places (teams x events x places); an empty place (teams of exactly
+    # count members) scores 0, so any replacement fills it
+    top_scores = np.zeros((num_teams, len(EVENTS), count + 1))
+    top_scores[..., :depth] = scores[top_ids, event_idx]
+    counting = top_scores[..., :count].sum(axis=2)
+
+    # place of each member on each event (teams x members x events), count + 1 if below the top count + 1
+    places = np.full((num_teams, team_size, len(EVENTS)), count + 1)
+    for place in range(depth):
+        places[top_ids[:, np.newaxis, :, place] == members[:, :, np.newaxis]] = place
+    replaced = places < count
+    member_scores = np.take_along_axis(np.broadcast_to(top_scores[:, np.newaxis], places.shape + (count + 1,)),
+                                       np.minimum(places, count)[..., np.newaxis], axis=3)[..., 0]
+    next_scores = np.broadcast_to(top_scores[:, np.newaxis, :, count], places.shape)
+    # without a counting member the next place counts instead and becomes the lowest counting score
+    remaining = np.where(replaced, counting[:, np.newaxis] - member_scores + next_scores, counting[:, np.newaxis])
+    lowest = np.where(replaced, next_scores, top_scores[:, np.newaxis, :, count - 1])
+    gains = np.maximum(scores[np.newaxis, np.newaxis] - lowest[:, :, np.newaxis], 0)
+    swapped = (remaining[:, :, np.newaxis] + gains).sum(axis=3)
+    on_team = np.zeros((num_teams, len(scores)), dtype=bool)
+    on_team[np.arange(num_teams)[:, np.newaxis], members] = True
+    swapped[np.broadcast_to(on_team[:, np.newaxis], swapped.shape)] = np.nan
+
+    return swapped, counting.sum(axis=1)
+
+
+def top_team_rows(team_scores, team_ids, k, rows=None):
+    """ Returns the rows (optionally only among the given candidate rows) of the k highest team scores plus
+    any tied with the kth, ordered by descending score then Team ID. """
+    rows = np.arange(len(team_scores)) if rows is None else np.asarray(rows)
+    candidate_scores = team_scores[rows]
+    if len(rows) > k:
+        # partial selection finds the kth best score without sorting every team
+        kth = -np.partition(-candidate_scores, k - 1)[k - 1]
+        keep = candidate_scores >= kth
+        rows, candidate_scores = rows[keep], candidate_scores[keep]
+
+    return rows[np.lexsort((team_ids[rows], -candidate_scores))]
+
+
+def athlete_postings(members, num_athletes):
+    """ Inverted index from athletes to the rows of teams they are a member of. Returns offsets and rows,
+    where the rows for athlete a are rows[offsets[a]:offsets[a + 1]] in ascending order. """
+    flat = np.ravel(members)
+    order = np.argsort(flat, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(flat, minlength=num_athletes))])
+
+    return offsets, order // members.shape[1]
+
+
+def _score_team_range(tables, team_size, start, stop, counts=(3,)):
+    """ Unranks the teams with IDs start to stop and scores them for every occasion and count.
+    Runs in a worker process. """
+    combos = team_combinations(len(tables[0][0]), team_size, start, stop)
+    return _score_counts(tables, combos, np.arange(start, stop, dtype=np.int64), counts)
+
+
+def _score_ranges_parallel(tables, team_size, counts, workers=None, chunks_per_worker=4):
+    """ Scores every team for every occasion and count across a process pool, one contiguous block of
+    Team IDs per task, joined back in order. Returns a dictionary of count to a list of TeamResults. """
+    workers = workers or os.cpu_count()
+    num_teams = math.comb(len(tables[0][0]), team_size)
+    # a few blocks per worker keeps every process busy if some blocks finish early
+    bounds = np.linspace(0, num_teams, workers * chunks_per_worker + 1).astype(np.int64)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        blocks = list(pool.map(_score_team_range, repeat(tables), repeat(team_size), bounds[:-1], bounds[1:],
+                               repeat(counts)))
+
+    return {count: [TeamResults.concat(occasion_blocks) for occasion_blocks in zip(*(block[count] for block in blocks))]
+            for count in counts}
+
+
+def score_teams_parallel(scores, team_size=5, workers=None, chunks_per_worker=4, count=3):
+    """ Scores every team like score_teams across a process pool. The Team ID range is split into
+    contiguous blocks, each worker unranks the first team of its block and scores it independently, and
+    blocks are joined back in order so Team IDs match the serial itertools.combinations order.
+    Returns TeamResults, or a list of TeamResults when given a list of score matrices (one per occasion). """
+    score_matrices = scores if isinstance(scores, list) else [scores]
+    tables = [_rank_tables(matrix) for matrix in score_matrices]
+    results = _score_ranges_parallel(tables, team_size, [count], workers, chunks_per_worker)[count]
+
+    return results if isinstance(scores, list) else results[0]
+
+
+def score_team_formats(score_matrices, formats, workers=None, chunk_size=CHUNK_SIZE):
+    """ Scores every team for several occasions (one score matrix each) and several TeamFormats. Per-event
+    rankings are computed once per occasion and shared by every format, the teams of each team size are
+    enumerated once (optionally across a pool of worker processes) and their member ranks sorted once per
+    chunk for every count, and formats differing only in up share their results, so each extra format costs
+    little more than its own counting arithmetic. Returns a dictionary of TeamFormat to a list of TeamResults,
+    one per occasion. """
+    tables = [_rank_tables(scores) for scores in score_matrices]
+    results = {}
+    for team_size in dict.fromkeys(team_format.team_size for team_format in formats):
+        counts = sorted({team_format.count for team_format in formats if team_format.team_size == team_size})
+        if workers:
+            by_count = _score_ranges_parallel(tables, team_size, counts, workers)
+        else:
+            by_count = _score_counts(tables, team_combinations(len(score_matrices[0]), team_size), None, counts, chunk_size)
+        for team_format in formats:
+            if team_format.team_size == team_size:
+                results[team_format] = by_count[team_format.count]
+
+    return results
+
+
+def iter_team_results(scores, team_size=5, chunk_size=STREAM_CHUNK_SIZE, count=3):
+    """ Yields TeamResults for consecutive Team ID ranges of chunk_size teams, unranking each range as it is
+    reached, so only one chunk of teams is held at a time. Chunks joined in order equal score_teams over all
+    teams. Given a list of score matrices (one per occasion), yields a list of TeamResults per chunk. """
+    score_matrices = scores if isinstance(scores, list) else [scores]
+    tables = [_rank_tables(matrix) for matrix in score_matrices]
+    num_teams = math.comb(len(score_matrices[0]), team_size)
+    for start in range(0, num_teams, chunk_size):
+        chunk = _score_team_range(tables, team_size, start, min(start + chunk_size, num_teams), [count])[count]
+        yield chunk if isinstance(scores, list) else chunk[0]
+
+
+def duplicate_team_groups(athletes, team_ids, team_scores=None):
+    """ Groups teams whose counting routines are identical (same athlete in every event and rank slot, which
+    also fixes the scores) in a single hashed pass: each team's counting athlete codes are packed into a
+    fixed-width key and keys are factorized. Returns a list of Team ID arrays, one per group of two or more
+    teams, each sorted by Team ID and the groups ordered by descending team score when given. """
+    num_teams = len(team_ids)
+    # pack each team's codes into whole 8-byte words
+    key_bytes = np.ascontiguousarray(np.reshape(athletes, (num_teams, -1))).view(np.uint8)
+    keys = np.zeros((num_teams, -(-key_bytes.shape[1] // 8) * 8), dtype=np.uint8)
+    keys[:, :key_bytes.shape[1]] = key_bytes
+    # factorize word by word, folding each word's codes into the running key codes
+    codes = np.zeros(num_teams, dtype=np.int64)
+    for word in keys.view(np.uint64).T:
+        word_codes, word_uniques = pd.factorize(word)
+        codes, _ = pd.factorize(codes * len(word_uniques) + word_codes)
+    duplicated = np.flatnonzero(np.bincount(codes)[codes] > 1)
+    if not len(duplicated):
+        return []
+
+    # order only the duplicated teams by group, then Team ID, and split into groups
+    rows = duplicated[np.lexsort((team_ids[duplicated], codes[duplicated]))]
+    starts = np.flatnonzero(np.diff(codes[rows], prepend=-1))
+    groups = np.split(np.asarray(team_ids)[rows], starts[1:])
+    if team_scores is not None:
+        order = np.argsort(-np.asarray(team_scores)[rows[starts]], kind='stable')
+        groups = [groups[i] for i in order]
+
+    return groups
+
+
+class TopTeamTracker:
+    """ Running set of the k best distinct teams (teams using the same counting routines count once) plus any
+    teams tied with the kth, and so every duplicate of them, updated one chunk of TeamResults at a time. """
+
+    def __init__(self, k=10):
+        self.k = k
+        self.results = None
+        # score of the kth best distinct team once k distinct teams have been seen
+        self.threshold = None
+
+    def update(self, results):
+        """ Merges a chunk of scored teams into the running top teams. """
+        if self.threshold is not None:
+            # teams below the kth distinct score can never get in
+            results = results.take(np.flatnonzero(results.team_scores >= self.threshold))
+        if self.results is not None:
+            results = TeamResults.concat([self.results, results])
+        order = np.lexsort((results.team_ids, -results.team_scores))
+        keys = np.unique(np.reshape(results.athletes[order], (len(order), -1)), axis=0, return_inverse=True)[1]
+        # position (in score order) of the best team of each distinct set of counting routines
+        firsts = np.sort(np.unique(np.ravel(keys), return_index=True)[1])
+        if len(firsts) >= self.k:
+            self.threshold = results.team_scores[order[firsts[self.k - 1]]]
+            order = order[results.team_scores[order] >= self.threshold]
+        self.results = results.take(order)
+
+    def duplicates(self):
+        """ Groups of Team IDs among the top teams that share all counting routines, ordered like
+        duplicate_team_groups. """
+        return duplicate_team_groups(self.results.athletes, self.results.team_ids, self.results.team_scores)
+
+
+def _suffix_top(scores, depth):
+    """ For every start position s, the best depth scores on each event among athletes s onwards
+    (padded with -inf), shape (athletes + 1, depth, events). """
+    num_athletes, num_events = scores.shape
+    suffix_top = np.full((num_athletes + 1, depth, num_events), -np.inf)
+    for s in range(num_athletes - 1, -1, -1):
+        suffix_top[s] = _insert_score(suffix_top[s + 1][np.newaxis], scores[s][np.newaxis])[0]
+
+    return suffix_top
+
+
+def _insert_score(top, values):
+    """ Inserts one score per event into per-event descending top-k arrays of shape (rows, k, events),
+    keeping the best k. """
+    top = top.copy()
+    carry = values
+    for i in range(top.shape[1]):
+        higher = np.maximum(top[:, i], carry)
+        carry = np.minimum(top[:, i], carry)
+        top[:, i] = higher
+
+    return top
+
+
+def _expand(partial, top, scores):
+    """ Appends every later athlete to each partial team (rows stay in ascending athlete order)
+    and updates the per-event top scores to include them. """
+    num_athletes = len(scores)
+    last = partial[:, -1]
+    counts = num_athletes - 1 - last
+    rows = np.repeat(np.arange(len(partial)), counts)
+    # offset of each child within its parent's block, so the new member is last + 1 + offset
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    members = last[rows] + 1 + offsets
+
+    return np.hstack([partial[rows], members[:, np.newaxis]]), _insert_score(top[rows], scores[members])
+
+
+def best_teams(scores, k=10, team_size=5, seed_size=24, count=3):
+    """ Finds the k highest scoring teams (plus any teams tied with the k-th) without scoring every
+    combination. Athletes are searched event leaders first and a partial team is dropped as soon as an upper
+    bound on its best completion (its top count on each event merged with the best remaining scores on that
+    event) falls below the k-th best score among teams of the first seed_size athletes searched.
+    Returns TeamResults ordered by score (then Team ID), identical to the head of a full enumeration. """
+    num_athletes = len(scores)
+    # search event leaders first, so the best remaining scores (and the bounds) fall off quickly
+    ranks, _ = event_rankings(scores)
+    perm = np.lexsort((-scores.sum(axis=1), ranks.min(axis=1)))
+    ordered = scores[perm]
+    suffix_top = _suffix_top(ordered, team_size)
+
+    # lower bound on the k-th best score from every team of the first athletes searched
+    seed = team_combinations(min(num_athletes, seed_size), team_size)
+    seed_scores = score_teams(ordered, seed, count=count).team_score_values()
+    threshold = np.sort(seed_scores)[-k] if len(seed_scores) >= k else -np.inf
+    # team scores are rounded to 2 decimals, so keep anything that could round to a tie
+    threshold -= _ROUNDING_MARGIN
+
+    partial = np.arange(num_athletes, dtype=np.int64)[:, np.newaxis]
+    top = _insert_score(np.full((num_athletes, count, scores.shape[1]), -np.inf), ordered)
+    for size in range(1, team_size + 1):
+        remaining = team_size - size
+        # drop partial teams without enough athletes left or that cannot reach the threshold
+        keep = num_athletes - 1 - partial[:, -1] >= remaining
+        partial, top = partial[keep], top[keep]
+        bound = top
+        for i in range(remaining):
+            bound = _insert_score(bound, suffix_top[partial[:, -1] + 1, i])
+        keep = bound.sum(axis=(1, 2)) >= threshold
+        partial, top = partial[keep], top[keep]
+        if remaining:
+            partial, top = _expand(partial, top, ordered)
+
+    # score the surviving teams exactly, in original athlete order so ties break as in full enumeration
+    combos = np.sort(perm[partial], axis=1).astype(np.uint8 if num_athletes <= 256 else np.int64)
+    results = score_teams(scores, combos, rank_combinations(combos, num_athletes), count=count)
+
+    return results.take(top_team_rows(results.team_scores, results.team_ids, k))
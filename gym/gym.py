@@ -1,79 +1,113 @@
-""" Functions to import data, calculate and save all possible 5-member team scores, and search for duplicate combinations of 12 counting
-scores among these 5-member teams. """
-from os import path
-import itertools
+""" Functions to import data, calculate and save the scores of all possible teams (5-member, 3-up, 3-count by default, or
+any TeamFormat), and search for duplicate combinations of counting scores (count x 4 per team) among these teams. """
 import math
+from os import path
 from openpyxl import Workbook, load_workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 import pandas as pd
 import numpy as np
+from gym import instrument
+from gym.engine import (EVENTS, STREAM_CHUNK_SIZE, TEAM_FINAL, Occasion, TeamFormat, TopTeamTracker, best_teams,
+                        duplicate_team_groups, iter_team_results, score_matrix, score_team_formats, sum_team_scores,
+                        swap_team_scores, unrank_combinations)
+from gym.index import build_team_index, query_team_rows
+from gym.loader import load_results
+from gym.store import (TeamResultsWriter, has_team_index, has_team_results, read_duplicates, read_team_index, read_team_results,
+                       remove_team_index, store_path, write_team_index, write_team_results)
+
+# sheet name of each occasion scored by run_team_combinations
+OCCASIONS = {'Day 1': 'day1', 'Day 2': 'day2', 'Average': 'avg'}
+
 
 def import_data(return_dicts=False):
     """ Imports and combines data for both days of competition, calculates average by athlete, 
     and returns DataFrame(s) of all data. Optionally returns dictionaries mapping each athlete
-    to a color and an int. """
-    day1 = pd.read_excel(r'./gym/data/2023 US Championships Results.xlsx', sheet_name='Prelims')
-    day2 = pd.read_excel(r'./gym/data/2023 US Championships Results.xlsx', sheet_name='Finals')
-    # merge day 1 and day 2 results
-    AA = day1.merge(day2, how='inner', on='Name', suffixes=['_day1','_day2'])
-    # calculate averages for each athlete and event (including AA)
-    for event in ['AA', 'Vault', 'Bars', 'Beam', 'Floor']:
-        AA[f'{event}_avg'] = AA[[f'{event}_day1', f'{event}_day2']].mean(axis=1)
-    # sort DF by descending all around average
-    AA.sort_values(by='AA_avg', ascending=False, inplace=True)
+    to a color and an int. The workbook is only parsed once per version (see gym.loader). """
+    AA, name_color, name_int = load_results()
 
     # optionally return dictionaries mapping each athlete to a color and an int
     if return_dicts:
-        # create dict mapping each athlete to a unique color
-        name_color = AA[['Name', 'Color']].set_index('Name')['Color'].to_dict()
-        # create dict to encode athlete names as ints to speed up later processes
-        name_int = AA.reset_index().set_index('Name')['index'].to_dict()
-        return AA, name_color, name_int
-
-    return AA
-
-def top_team_scores(AA, occ):
-    """ For each possible 5-member team, calculates the team score using the top 3 scores
-    on each event among the team members, simulating a 3-up, 3-count competition.
-    Returns dataframe with Team ID, members, and score, sorted by team score;
-    matrix of top 3 scores on each event for all possible teams, 
-    nested list of athletes who received the aforementioned scores. """
-    num_athletes = len(AA)
-    # create structures to store each id's members, counting scores and athletes for each event, total team score
-    team_id = pd.DataFrame(columns=['Team ID', 'Team Score', 'Member 1', 'Member 2', 'Member 3', 'Member 4', 'Member 5'])
-    #A- team_scores = np.zeros(math.comb(num_athletes, 5))
-    counting_scores = np.zeros((math.comb(num_athletes, 5), 4, 3))
-    counting_names = [ [ [ [] for  i in range(3) ] for i in range(4)] for i in range(math.comb(num_athletes, 5))]
-    # iterate through all 5-member team combinations
-    for i, row in enumerate(itertools.combinations(AA.values, 5)):
-        team = pd.DataFrame(row, columns=['Name', 'Vault_day1', 'Bars_day1', 'Beam_day1', 'Floor_day1', 'AA_day1',
-        'Color', 'Vault_day2', 'Bars_day2', 'Beam_day2', 'Floor_day2', 'AA_day2',
-        'AA_avg', 'Vault_avg', 'Bars_avg', 'Beam_avg', 'Floor_avg'])  
-        score = 0 # team score
-        # iterate over all events
-        for ii, event in enumerate(['Vault', 'Bars', 'Beam', 'Floor']):
-            # specify event and occasion (day or average)
-            event_occ = f'{event}_{occ}'
-            # create temporary df of the team sorted by event score
-            sort = team[[f'Vault_{occ}', f'Bars_{occ}', f'Beam_{occ}', f'Floor_{occ}', 'Name']].sort_values(by=event_occ, ascending=False)[:3]
-            # store top 3 scores and associated athlete names
-            counting_scores[i,ii,:] = flatten([[sort[event_occ].iloc[j]] for j in range(3)])
-            counting_names[i][ii] = [[sort['Name'].iloc[j]] for j in range(3)]
-            score += counting_scores[i,ii,:].sum()
-
-        team_members = [i] + [round(score,2)] + team['Name'].tolist()
-        team_id.loc[i] = team_members
-
-    return team_id, counting_scores, counting_names
-
-
-def write_team_scores_to_excel(counting_names, counting_scores, sheet_name, num_athletes=28):
-    """ Writes counting routine data for each possible 5-member team to Excel to avoid re-running all combinations.
+        return AA.copy(), dict(name_color), dict(name_int)
+
+    return AA.copy()
+
+@instrument.traced
+def top_team_scores(AA, occ, workers=None, team_format=TEAM_FINAL):
+    """ For each possible team of the TeamFormat's size (5 by default), calculates the team score using the top count
+    scores (3 by default) on each event among the team members, simulating a 3-up, 3-count competition
+    (or the given TeamFormat, e.g. TeamFormat(team_size=5, up=4, count=3) for qualification).
+    Optionally splits the teams across a pool of worker processes.
+    Returns dataframe with Team ID, members, and score, in Team ID order;
+    matrix of top count scores on each event for all possible teams, 
+    array (teams x events x ranks x 1) of athletes who received the aforementioned scores. """
+    return decode_team_results(AA, occ, score_all_teams(AA, occ, workers, team_format))
+
+
+@instrument.traced
+def score_all_teams(AA, occ, workers=None, team_format=TEAM_FINAL):
+    """ Encodes every team of the given format's size (5 by default) as a row of athlete indices and scores
+    all teams in bulk, optionally across a pool of worker processes. Returns TeamResults in Team ID order, with
+    athlete names attached. """
+    return score_occasions(AA, {'occasion': occ}, workers, team_format)['occasion']
+
+
+@instrument.traced
+def score_occasions(AA, occasions=OCCASIONS, workers=None, team_format=TEAM_FINAL):
+    """ Scores every team of the given format's size for several occasions (a dictionary of sheet name to day1,
+    day2, avg or an Occasion such as Occasion(['day1', 'day2'], weights=[0.4, 0.6])) in one enumeration of the
+    teams, optionally across a pool of worker processes. Returns a dictionary of sheet name to TeamResults in Team ID order. """
+    return score_formats(AA, [team_format], occasions, workers)[team_format]
+
+
+@instrument.traced
+def score_formats(AA, formats, occasions=OCCASIONS, workers=None):
+    """ Scores every team for several team formats (e.g. [TeamFormat(5, 3, 3), TeamFormat(5, 4, 3),
+    TeamFormat(4, 3, 3)]) and occasions, sharing the per-event rankings across formats and each enumeration
+    of teams across formats of the same team size. Returns a dictionary of TeamFormat to a dictionary of
+    sheet name to TeamResults in Team ID order. """
+    score_matrices = [score_matrix(AA, occ) for occ in occasions.values()]
+    results = score_team_formats(score_matrices, formats, workers)
+    names = AA['Name'].to_numpy()
+    for team_format, format_results in results.items():
+        for occasion_results in format_results:
+            occasion_results.names = names
+        instrument.count('teams scored', len(format_results[0]) * len(format_results))
+
+    return {team_format: dict(zip(occasions, format_results)) for team_format, format_results in results.items()}
+
+
+@instrument.traced
+def top_k_team_scores(AA, occ, n=10, team_format=TEAM_FINAL):
+    """ Finds the n highest scoring teams of the given format (and any teams tied with the nth) without scoring
+    every possible team. Returns the same structures as top_team_scores for only those teams, sorted by
+    descending team score (then Team ID). """
+    results = best_teams(score_matrix(AA, occ), k=n, team_size=team_format.team_size, count=team_format.count)
+    results.names = AA['Name'].to_numpy()
+    instrument.count('teams returned', len(results))
+
+    return decode_team_results(AA, occ, results)
+
+
+@instrument.traced
+def decode_team_results(AA, occ, results):
+    """ Decodes TeamResults to a dataframe with Team ID, score, and members; a matrix of counting scores
+    (looked up from AA, so values are exactly the source floats); and an array
+    (teams x events x ranks x 1) of counting athlete names. """
+    counting_scores = score_matrix(AA, occ)[results.athletes, np.arange(len(EVENTS))[:, np.newaxis]]
+    counting_names = results.names[results.athletes][..., np.newaxis]
+
+    return results.teams_frame(), counting_scores, counting_names
+
+
+@instrument.traced
+def write_team_scores_to_excel(counting_names, counting_scores, sheet_name):
+    """ Writes counting routine data for each possible team to Excel to avoid re-running all combinations.
      Sheet name specifies occasion (day or average). Called by run_team_combinations. """
+    num_teams, _, count = np.shape(counting_scores)
     # construct dataframe of all counting scores for each team
-    team_data = {'Team ID': np.repeat(np.array([i for i in range(math.comb(num_athletes, 5))]), 12), # 12 counting scores
-            'Event': np.tile(np.repeat(np.array(['Vault', 'Bars', 'Beam', 'Floor']), 3), math.comb(num_athletes, 5)),
-            'Score_Rank': np.tile(np.array([1,2,3]), 4*math.comb(num_athletes, 5)),
+    team_data = {'Team ID': np.repeat(np.arange(num_teams), 4*count), # 12 counting scores for 3-count
+            'Event': np.tile(np.repeat(np.array(['Vault', 'Bars', 'Beam', 'Floor']), count), num_teams),
+            'Score_Rank': np.tile(np.arange(1, count+1), 4*num_teams),
             'Name': np.reshape(np.array(counting_names), -1),
             'Score': np.reshape(counting_scores, -1)}
 
@@ -89,75 +123,195 @@ def write_team_scores_to_excel(counting_names, counting_scores, sheet_name, num_
     for r in dataframe_to_rows(pd.DataFrame(team_data), index=False, header=False):
         sheet.append(r)
     wb.save(r'./gym/data/Highest Scoring Teams.xlsx')
+    instrument.count('rows written', 4 * count * num_teams)
+    instrument.count_bytes('bytes written', r'./gym/data/Highest Scoring Teams.xlsx')
 
     return pd.DataFrame(team_data)
 
 
-def run_team_combinations(AA):
-    """ Runs all possible team combinations with day 1, day 2, and average scores.
-    Writes counting routine data to Excel, Team ID, score, and members to CSV. """
-    sheet_names = ['Day 1', 'Day 2', 'Average']
+@instrument.traced
+def run_team_combinations(AA, workers=None, excel=False, chunk_size=None, occasions=OCCASIONS, team_format=TEAM_FINAL,
+                          index=None):
+    """ Runs all possible team combinations with day 1, day 2, and average scores (or the given dictionary of
+    sheet name to occasion) in one enumeration, optionally across a pool of worker processes or streamed in chunks
+    of chunk_size teams (see stream_team_combinations), for 5-member, 3-up, 3-count teams or the given TeamFormat.
+    Writes counting routine data to the results store (and optionally Excel), Team ID, score, and members to CSV,
+    and the athlete -> team index used by query_top_teams if index is True (by default, only when not streaming,
+    since the index orders every team by score and so needs memory for every team). Exporting to Excel also
+    decodes every team of an occasion at once, streamed or not. """
+    if index is None:
+        index = not chunk_size
+    if chunk_size:
+        stream_team_combinations(AA, occasions, chunk_size, team_format=team_format)
+        for sheet_name, occ in occasions.items():
+            with instrument.stage('write_team_results'):
+                if index:
+                    # the index orders every team by score, so it is built from the memory-mapped store
+                    write_team_index(sheet_name, build_team_index(read_team_results(sheet_name)))
+                else:
+                    remove_team_index(sheet_name)
+            if excel:
+                _, counting_scores, counting_names = decode_team_results(AA, occ, read_team_results(sheet_name))
+                write_team_scores_to_excel(counting_names, counting_scores, sheet_name)
+        return
 
+    # calculate scores for all possible team combinations and occasions
+    all_results = score_occasions(AA, occasions, workers, team_format)
     # loop over all occasions
-    for i, occ in enumerate(['day1', 'day2', 'avg']):
-        # calculate scores for all possible team combinations
-        team_id, counting_scores, counting_names = top_team_scores(AA, occ)
+    for sheet_name, occ in occasions.items():
+        results = all_results[sheet_name]
+        # write counting score data to the results store
+        with instrument.stage('write_team_results'):
+            write_team_results(sheet_name, results)
+            if index:
+                write_team_index(sheet_name, build_team_index(results))
+            else:
+                remove_team_index(sheet_name)
+            instrument.count_bytes('bytes written', store_path(sheet_name))
         # write team member data to CSV
-        team_id.to_csv(f'./gym/data/teams/{sheet_names[i]} Teams.csv', index=False)
-        # write counting score data to Excel
-        write_team_scores_to_excel(counting_names, counting_scores, sheet_names[i])
+        with instrument.stage('write_teams_csv'):
+            results.teams_frame().to_csv(f'./gym/data/teams/{sheet_name} Teams.csv', index=False)
+            instrument.count('rows written', len(results))
+            instrument.count_bytes('bytes written', f'./gym/data/teams/{sheet_name} Teams.csv')
+        if excel:
+            _, counting_scores, counting_names = decode_team_results(AA, occ, results)
+            write_team_scores_to_excel(counting_names, counting_scores, sheet_name)
 
 
+@instrument.traced
+def stream_team_combinations(AA, occasions=OCCASIONS, chunk_size=STREAM_CHUNK_SIZE, n=10, team_format=TEAM_FINAL):
+    """ Scores every team of the given TeamFormat (5-member by default) for each occasion (a dictionary of sheet
+    name to occasion) one chunk of Team IDs at a time, writing each chunk straight to the results store and the
+    Teams CSV and merging it into a running top n tracker, so memory use does not grow with the number of teams.
+    The files match run_team_combinations byte for byte. Returns a dictionary of sheet name to TopTeamTracker
+    with the n best distinct teams (and their duplicates). """
+    names = AA['Name'].to_numpy()
+    writers = {sheet_name: TeamResultsWriter(sheet_name, math.comb(len(AA), team_format.team_size), names)
+               for sheet_name in occasions}
+    trackers = {sheet_name: TopTeamTracker(n) for sheet_name in occasions}
+    score_matrices = [score_matrix(AA, occ) for occ in occasions.values()]
+    for chunks in iter_team_results(score_matrices, team_format.team_size, chunk_size, team_format.count):
+        for sheet_name, chunk in zip(occasions, chunks):
+            chunk.names = names
+            instrument.count('teams scored', len(chunk))
+            first = writers[sheet_name].written == 0
+            # the store directory is created on the first write, before the CSV next to it
+            writers[sheet_name].write(chunk)
+            chunk.teams_frame().to_csv(f'./gym/data/teams/{sheet_name} Teams.csv', index=False, header=first,
+                                       mode='w' if first else 'a')
+            trackers[sheet_name].update(chunk)
+    for sheet_name, writer in writers.items():
+        writer.close()
+        instrument.count('rows written', writer.written)
+        instrument.count_bytes('bytes written', store_path(sheet_name), f'./gym/data/teams/{sheet_name} Teams.csv')
+
+    return trackers
+
+
+@instrument.traced
 def import_counting_scores(sheet_name):
     """ Used to import counting scores for the occasion specified by sheet name which are returned as a DataFrame.
     Checks for teams with all of the same counting scores, removes them from the aforementioned DataFrame, and returns all team data along
     with Team IDs of the removed equivalent teams. """
-    # import counting score data
-    scores = pd.read_excel(r'./gym/data/Highest Scoring Teams.xlsx', sheet_name=sheet_name)
-    # import team member combinations and sort by team score
-    teams = pd.read_csv(f'./gym/data/teams/{sheet_name} Teams.csv')
+    # import counting score data and team member combinations (from the results store when available)
+    if has_team_results(sheet_name):
+        with instrument.stage('read_team_results'):
+            results = read_team_results(sheet_name)
+            scores = results.counting_frame()
+            teams = results.teams_frame()
+            instrument.count('teams read', len(results))
+            instrument.count_bytes('bytes read', store_path(sheet_name))
+        # find any teams with the same counting routines, unless they were saved since the results were written
+        duplicates = read_duplicates(sheet_name)
+        if duplicates is None:
+            duplicates = find_same_3up(results)
+    else:
+        with instrument.stage('read_excel'):
+            scores = pd.read_excel(r'./gym/data/Highest Scoring Teams.xlsx', sheet_name=sheet_name)
+            teams = pd.read_csv(f'./gym/data/teams/{sheet_name} Teams.csv')
+            instrument.count('teams read', len(teams))
+            instrument.count_bytes('bytes read', r'./gym/data/Highest Scoring Teams.xlsx', f'./gym/data/teams/{sheet_name} Teams.csv')
+        duplicates = find_same_3up(scores)
+    # sort teams by team score
     teams.sort_values(by='Team Score', ascending=False, inplace=True)
     teams.reset_index(drop=True, inplace=True)
-    # find and remove any teams with the same 12 counting routines
-    duplicates = find_same_3up(teams, scores)
+    # remove all but one of each group of teams with the same counting routines
     scores, removed_teams = remove_duplicate_3up(scores, duplicates)
 
     return scores, teams, removed_teams
 
 
-def find_same_3up(team_members, counting_scores):
-    """ Iterates through all teams which share a team score to find teams that have different team members,
-    but utilize the same set of 12 counting routines. Returns a lested list of arrays with Team IDs
-    of teams which share duplicate routines. Called by import_counting_scores. """
-    # narrow search to only observations which have a duplicate team score
-    duplicate_score_rows = team_members[team_members.duplicated(subset='Team Score', keep=False)].copy()
-    # find each unique score to iterate through
-    unique_scores = duplicate_score_rows['Team Score'].unique() # get all scores that multiple teams achieved
-    redundant_teams = []
-
-    # create dictionaries for encoding
-    _, _, name_int = import_data(return_dicts=True)
-    event_int = {'Vault': 0, 'Bars': 1, 'Beam': 2, 'Floor': 3}
-
-    # iterate across all duplicated scores
-    for score in unique_scores:
-        # find all team id's that had team score of score
-        team_ids = duplicate_score_rows[duplicate_score_rows['Team Score'] == score]['Team ID'].values
-        same_score_teams = counting_scores[counting_scores['Team ID'].isin(team_ids)].copy()
-        same_score_teams.set_index('Team ID', inplace=True)        
-        # encode names and events for quick comparison of 3d arrays
-        same_score_teams['Athlete ID'] = same_score_teams['Name'].apply(lambda x: name_int[x])
-        same_score_teams['Event ID'] = same_score_teams['Event'].apply(lambda x: event_int[x])
-        counting = np.array(same_score_teams[['Athlete ID', 'Score', 'Score_Rank', 'Event ID']]).reshape((len(team_ids),12,4))
-        # find duplicate teams (have same 12 counting routines)
-        _, inverse, count = np.unique(counting, return_inverse=True, return_counts=True, axis=0)
-        duplicate_idx = np.where(count[inverse]>1)[0]
-        duplicate_teams = team_ids[duplicate_idx]
-        redundant_teams.append(duplicate_teams)        
-
-    return [ele for ele in redundant_teams if ele != []]
+@instrument.traced
+def query_top_teams(sheet_name, required=(), excluded=(), counts_on=None, n=10):
+    """ Finds the n highest scoring teams (and any tied with the nth) for the occasion specified by sheet name
+    that include all required athletes, none of the excluded athletes, and the athletes counting on each event
+    given by counts_on (e.g. {'Beam': ['Simone Biles']}), using the stored athlete -> team index.
+    Returns a dataframe with Team ID, score, and members, sorted by descending team score (then Team ID). """
+    if not has_team_index(sheet_name):
+        raise ValueError(f'no athlete -> team index for {sheet_name!r} (run run_team_combinations with index=True)')
+    results = read_team_results(sheet_name)
+    codes = {name: i for i, name in enumerate(results.names)}
+    rows = query_team_rows(read_team_index(sheet_name), results.team_scores,
+                           required=[codes[name] for name in required], excluded=[codes[name] for name in excluded],
+                           counts_on={event: [codes[name] for name in names] for event, names in (counts_on or {}).items()}, k=n)
+
+    return results.take(rows).teams_frame()
+
+
+@instrument.traced
+def swap_analysis(AA, occ, team_ids, team_format=TEAM_FINAL):
+    """ Scores, in bulk, every replacement of one member of each given team (e.g. the top team IDs returned by
+    team_scores_bar_chart) by an athlete not on it. Returns a dataframe with Team ID, the member swapped out and
+    the athlete swapped in, the team score before and after the swap (sums of counting scores, not rounded to
+    2 decimals) and the change, ordered by team (as given) then by descending score after the swap. """
+    team_ids = np.asarray(team_ids, dtype=np.int64)
+    members = unrank_combinations(team_ids, len(AA), team_format.team_size)
+    swapped, team_scores = swap_team_scores(score_matrix(AA, occ), members, team_format.count)
+    num_teams, team_size, num_athletes = swapped.shape
+    names = AA['Name'].to_numpy()
+    swaps = pd.DataFrame({'Team ID': np.repeat(team_ids, team_size * num_athletes),
+                          'Out': names[np.repeat(np.ravel(members), num_athletes)],
+                          'In': np.tile(names, num_teams * team_size),
+                          'Team Score': np.repeat(team_scores, team_size * num_athletes),
+                          'Swap Score': np.ravel(swapped)})
+    # drop float noise from the sums and differences without rounding away real decimals
+    swaps[['Team Score', 'Swap Score']] = swaps[['Team Score', 'Swap Score']].round(6)
+    swaps['Delta'] = np.round(swaps['Swap Score'] - swaps['Team Score'], 6)
+    team_order = np.repeat(np.arange(num_teams), team_size * num_athletes)
+    swaps = swaps.iloc[np.lexsort((-swaps['Swap Score'].to_numpy(), team_order))].dropna(subset=['Swap Score'])
+    instrument.count('swaps scored', len(swaps))
+
+    return swaps.reset_index(drop=True)
+
+
+def best_swaps(swaps, per_member=True):
+    """ Keeps the best replacement for each member of each team (or only each team's best overall)
+    from swap_analysis output. """
+    return swaps.drop_duplicates(['Team ID', 'Out'] if per_member else ['Team ID']).reset_index(drop=True)
+
+
+@instrument.traced
+def find_same_3up(counting_scores):
+    """ Finds teams that have different team members, but utilize the same set of counting routines (count x 4,
+    12 for 3-count), in one vectorized pass over TeamResults or a long-format DataFrame of counting scores.
+    Returns a list of arrays with Team IDs of teams which share duplicate routines. Called by
+    import_counting_scores. """
+    if isinstance(counting_scores, pd.DataFrame):
+        # rows are in Team ID, event, rank order, so encoding names gives each team's count x 4 counting athletes
+        per_team = len(EVENTS) * counting_scores['Score_Rank'].max()
+        athletes = pd.factorize(counting_scores['Name'])[0].reshape(-1, per_team)
+        team_ids = counting_scores['Team ID'].to_numpy()[::per_team]
+        # team scores from the counting scores, summed and rounded like the stored ones so groups come out in the same order
+        team_scores = sum_team_scores(counting_scores['Score'].to_numpy(dtype=float).reshape(len(team_ids), len(EVENTS), -1))
+        groups = duplicate_team_groups(athletes.astype(np.min_scalar_type(athletes.max())), team_ids, team_scores)
+    else:
+        groups = duplicate_team_groups(counting_scores.athletes, counting_scores.team_ids, counting_scores.team_scores)
+    instrument.count('duplicate groups', len(groups))
+
+    return groups
 
 
+@instrument.traced
 def remove_duplicate_3up(counting_scores, duplicates):
     """ Removes all but one observation of identified duplicates from DataFrame of all counting scores.
     Returns altered DataFrame along with a dictionary mapping the non-removed team to all its equivalent 
@@ -192,11 +346,12 @@ def get_duplicates_for_top_team_table(top_team_ids, removed_teams, team_df):
             # construct dataframe of all equivalent team combinations
             team_options = team_df[team_df['Team ID'] == full_team_ids[i][0][0]].drop(['Team ID', 'Team Score'], axis=1).copy()
             team_options = pd.concat([team_options, team_df[team_df['Team ID'].isin(full_team_ids[i][1])].drop(['Team ID', 'Team Score'], axis=1)])
-            # find the 4 recurring athletes and the swappable ones
+            # find the recurring athletes (all but one member) and the swappable ones
             value_counts = pd.Series(flatten(team_options.values)).value_counts().to_frame()
+            constant = team_options.shape[1] - 1
             duplicate_team_ids.append(teams[0])
-            team_constants.append(list(value_counts.iloc[:4].index))
-            team_variables.append(list(value_counts.iloc[4:].index))
+            team_constants.append(list(value_counts.iloc[:constant].index))
+            team_variables.append(list(value_counts.iloc[constant:].index))
 
     if duplicate_team_ids:
         return duplicate_team_ids, team_constants, team_variables
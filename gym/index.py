@@ -0,0 +1,87 @@
+""" Inverted athlete -> team index for constrained team queries. Teams are numbered by position in score order
+(descending team score, then Team ID) and each athlete gets a bitset over those positions for the teams they
+are a member of and, per event, the teams they count on, so "best teams with A and B but not C" is a few
+bitwise ANDs scanned from the top instead of a filter over every team. """
+from dataclasses import dataclass
+import math
+import numpy as np
+from gym.engine import EVENTS
+
+# positions scanned per query step, a whole number of 64-bit words (queries stop once enough teams are found)
+QUERY_BLOCK = 1 << 16
+
+
+@dataclass
+class TeamIndex:
+    """ order holds the results row at each score-order position; member_bits (athletes x words) and
+    counting_bits (athletes x events x words) are little-endian bitsets over positions, 64 per uint64 word. """
+    order: np.ndarray
+    member_bits: np.ndarray
+    counting_bits: np.ndarray
+
+    def __len__(self):
+        return len(self.order)
+
+
+def _bitsets(codes, order, num_codes, chunk_size=QUERY_BLOCK):
+    """ Packs athlete codes (teams x slots, or teams x events x slots) into one bitset over score-order positions
+    per code (and event). Works through positions in chunks, gathering only that chunk's rows of codes, so
+    neither reordered codes nor unpacked flags are held for every team. """
+    num_positions = len(order)
+    num_words = -(-num_positions // 64)
+    groups = codes.shape[1:-1]
+    num_groups = math.prod(groups)
+    bits = np.zeros((num_codes, num_groups, num_words * 8), dtype=np.uint8)
+    for lo in range(0, num_positions, chunk_size):
+        chunk = np.asarray(codes[order[lo:lo + chunk_size]]).reshape(-1, num_groups, codes.shape[-1])
+        flags = np.zeros((num_codes, num_groups, len(chunk)), dtype=bool)
+        flags[chunk, np.arange(num_groups)[:, np.newaxis], np.arange(len(chunk))[:, np.newaxis, np.newaxis]] = True
+        bits[:, :, lo // 8:lo // 8 + -(-len(chunk) // 8)] = np.packbits(flags, axis=2, bitorder='little')
+
+    return bits.view(np.uint64).reshape((num_codes,) + groups + (num_words,))
+
+
+def build_team_index(results):
+    """ Builds the index for TeamResults (in memory or memory-mapped from the store): the score order of all
+    teams plus member and counting bitsets per athlete (and event). """
+    order = np.lexsort((results.team_ids, -np.asarray(results.team_scores)))
+    num_athletes = len(results.names) if results.names is not None else int(np.max(results.members)) + 1
+    member_bits = _bitsets(results.members, order, num_athletes)
+    counting_bits = _bitsets(results.athletes, order, num_athletes)
+
+    return TeamIndex(order, member_bits, counting_bits)
+
+
+def query_team_rows(index, team_scores, required=(), excluded=(), counts_on=None, k=10):
+    """ Returns the results rows of the k best teams (plus any tied with the kth) that include every required
+    athlete, none of the excluded athletes and, for each event in counts_on, have the given athletes counting
+    on it. Athletes are codes and counts_on maps event names to lists of codes. Rows are ordered by descending
+    score then Team ID. """
+    counts_on = counts_on or {}
+    num_words = index.member_bits.shape[1]
+    block_words = QUERY_BLOCK // 64
+    positions = []
+    kth_score = None
+    for lo in range(0, num_words, block_words):
+        hi = min(lo + block_words, num_words)
+        mask = np.full(hi - lo, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for athlete in required:
+            mask &= index.member_bits[athlete, lo:hi]
+        for athlete in excluded:
+            mask &= ~index.member_bits[athlete, lo:hi]
+        for event, athletes in counts_on.items():
+            for athlete in athletes:
+                mask &= index.counting_bits[athlete, EVENTS.index(event), lo:hi]
+        block = lo * 64 + np.flatnonzero(np.unpackbits(mask.view(np.uint8), bitorder='little'))
+        positions.append(block[block < len(index)])
+        if kth_score is None and sum(map(len, positions)) >= k:
+            kth_score = team_scores[index.order[np.concatenate(positions)[k - 1]]]
+        # positions are in score order, so once a block ends below the kth score later blocks cannot tie it
+        if kth_score is not None and team_scores[index.order[min(hi * 64, len(index)) - 1]] < kth_score:
+            break
+
+    rows = index.order[np.concatenate(positions)]
+    if len(rows) > k:
+        rows = rows[team_scores[rows] >= team_scores[rows[k - 1]]]
+
+    return rows
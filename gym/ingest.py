@@ -0,0 +1,183 @@
+""" Ingestion of every results workbook in a directory (several meets per season, several seasons) into one long
+table of scores with a row per athlete, meet, day and event. Workbooks are parsed in parallel and consolidated
+into a cache that is updated incrementally: only workbooks that are new or whose contents changed are parsed
+again, and rows of workbooks that were removed are dropped. Occasions such as a season average or each athlete's
+last 3 meets are derived from the table into an import_data-shaped roster the team engine can score directly.
+
+    scores, colors = load_meets()
+    AA = meet_roster(scores, colors, {'season': {'seasons': [2023]}, 'last3': {'last': 3}})
+    run_team_combinations(AA, occasions={'Season Average': 'season', 'Last 3 Meets': 'last3'})
+
+Workbook names start with the meet date, as a year ('2023 US Championships Results.xlsx') or a full date
+('2024-03-02 Winter Cup.xlsx'), which sets the season and the order of meets. Each sheet with a Name column and
+a column for every event is one day of competition, in sheet order; a Color column, where present, gives the
+athlete's plot color. """
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+from os import makedirs, path
+import re
+import pandas as pd
+from gym import instrument
+from gym.engine import EVENTS
+
+MEETS_DIR = './gym/data/meets'
+MEETS_CACHE_PATH = './gym/data/cache/meets.pkl'
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+
+SCORE_COLUMNS = ['athlete', 'meet', 'date', 'season', 'day', 'event', 'score']
+_DATE_PATTERN = re.compile(r'^(\d{4})(?:[-_.](\d{2})[-_.](\d{2}))?\b')
+
+
+def meet_date(file_path):
+    """ Date of the meet from the start of the workbook name (January 1st if only the year is given). """
+    name = path.basename(file_path)
+    match = _DATE_PATTERN.match(name)
+    if match is None:
+        raise ValueError(f'workbook name {name!r} does not start with the meet year or date')
+    year, month, day = match.groups()
+    return pd.Timestamp(int(year), int(month or 1), int(day or 1))
+
+
+def _typed(scores):
+    """ Casts a long score table to its column types (categories for names, small ints for season and day). """
+    scores = scores.astype({'season': 'int16', 'day': 'int8', 'score': 'float64'})
+    for column in ['athlete', 'meet']:
+        scores[column] = scores[column].astype('category')
+    scores['event'] = pd.Categorical(scores['event'], categories=EVENTS, ordered=True)
+    scores['date'] = pd.to_datetime(scores['date'])
+
+    return scores[SCORE_COLUMNS]
+
+
+def parse_meet(file_path):
+    """ Reads every day of competition in a workbook. Returns the long score table (one row per athlete, day and
+    event with a score) and a table of athlete colors. """
+    meet = path.splitext(path.basename(file_path))[0]
+    date = meet_date(file_path)
+    days, colors = [], []
+    for sheet in pd.read_excel(file_path, sheet_name=None).values():
+        if not {'Name', *EVENTS} <= set(sheet.columns):
+            continue
+        day = sheet[['Name'] + EVENTS].melt(id_vars='Name', var_name='event', value_name='score').dropna()
+        day['day'] = len(days) + 1
+        days.append(day)
+        if 'Color' in sheet.columns:
+            colors.append(sheet[['Name', 'Color']].dropna())
+
+    scores = pd.concat(days, ignore_index=True) if days else pd.DataFrame(columns=['Name', 'event', 'score', 'day'])
+    scores = scores.rename(columns={'Name': 'athlete'}).assign(meet=meet, date=date, season=date.year)
+    colors = (pd.concat(colors, ignore_index=True) if colors else pd.DataFrame(columns=['Name', 'Color']))
+    colors = colors.drop_duplicates('Name').rename(columns={'Name': 'athlete', 'Color': 'color'}).assign(meet=meet, date=date)
+
+    return _typed(scores), colors.reset_index(drop=True)
+
+
+def _file_hash(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def discover_meets(meets_dir=MEETS_DIR):
+    """ Results workbooks in the directory, by file name (skipping Excel's ~$ lock files). """
+    return sorted(name for name in os.listdir(meets_dir)
+                  if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith('~$'))
+
+
+@instrument.traced
+def load_meets(meets_dir=MEETS_DIR, cache_path=MEETS_CACHE_PATH, workers=None):
+    """ Returns the long score table of every workbook in the directory (columns athlete, meet, date, season,
+    day, event, score, sorted by date, meet, day, athlete and event) and the athlete colors per meet. Only
+    workbooks that are new or changed since the cache was last written are parsed, across a pool of worker
+    processes (in this process if workers is 1 or a single workbook changed). """
+    cache = pd.read_pickle(cache_path) if path.exists(cache_path) else {'files': {}, 'scores': None, 'colors': None}
+    files = {}
+    stale = []
+    for name in discover_meets(meets_dir):
+        file_path = path.join(meets_dir, name)
+        stat = path.getmtime(file_path), path.getsize(file_path)
+        cached = cache['files'].get(name)
+        if cached is not None and cached['stat'] == stat:
+            files[name] = cached
+            continue
+        # a touched but unchanged workbook only needs its recorded stat updated
+        digest = _file_hash(file_path)
+        files[name] = {'stat': stat, 'sha256': digest, 'meet': path.splitext(name)[0]}
+        if cached is None or cached['sha256'] != digest:
+            stale.append(name)
+    if not stale and files == cache['files'] and cache['scores'] is not None:
+        return cache['scores'], cache['colors']
+
+    paths = [path.join(meets_dir, name) for name in stale]
+    if workers == 1 or len(paths) < 2:
+        parsed = [parse_meet(file_path) for file_path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(parse_meet, paths))
+    instrument.count('workbooks parsed', len(paths))
+
+    # keep cached rows of workbooks that are still present and unchanged
+    kept = {files[name]['meet'] for name in files if name not in stale}
+    scores, colors = [], []
+    if cache['scores'] is not None:
+        scores.append(cache['scores'][cache['scores']['meet'].isin(kept)])
+        colors.append(cache['colors'][cache['colors']['meet'].isin(kept)])
+    scores += [meet_scores for meet_scores, _ in parsed]
+    colors += [meet_colors for _, meet_colors in parsed]
+    # categories differ between meets, so the concatenated columns are cast again
+    scores = _typed(pd.concat([frame.astype({'athlete': str, 'meet': str, 'event': str}) for frame in scores],
+                              ignore_index=True) if scores else pd.DataFrame(columns=SCORE_COLUMNS))
+    scores = scores.sort_values(['date', 'meet', 'day', 'athlete', 'event']).reset_index(drop=True)
+    colors = pd.concat(colors, ignore_index=True) if colors else pd.DataFrame(columns=['athlete', 'color', 'meet', 'date'])
+    colors = colors.sort_values(['date', 'meet']).reset_index(drop=True)
+
+    makedirs(path.dirname(cache_path), exist_ok=True)
+    pd.to_pickle({'files': files, 'scores': scores, 'colors': colors}, cache_path)
+
+    return scores, colors
+
+
+def select_scores(scores, seasons=None, meets=None, days=None, last=None):
+    """ Rows of the long score table from the given seasons, meets and day numbers (all if None). With last,
+    only each athlete's last `last` meets among those are kept, by meet date. """
+    keep = pd.Series(True, index=scores.index)
+    if seasons is not None:
+        keep &= scores['season'].isin(seasons)
+    if meets is not None:
+        keep &= scores['meet'].isin(meets)
+    if days is not None:
+        keep &= scores['day'].isin(days)
+    scores = scores[keep]
+    if last is not None:
+        athlete_meets = scores[['athlete', 'date', 'meet']].drop_duplicates()
+        athlete_meets = athlete_meets.sort_values(['date', 'meet']).groupby('athlete', observed=True).tail(last)
+        scores = scores.merge(athlete_meets, on=['athlete', 'date', 'meet'])
+
+    return scores
+
+
+def meet_roster(scores, colors, occasions):
+    """ Builds an import_data-shaped roster from the long score table: for every occasion (a column suffix
+    mapped to select_scores arguments, plus an optional 'how' of 'mean' (default), 'max' or 'median' to
+    combine each athlete's scores on an event), {event}_{suffix} and AA_{suffix} columns, along with each
+    athlete's latest color. Only athletes with a score on every event for every occasion are kept, sorted by
+    descending AA on the first occasion. Suffixes can then be passed as occasions to the team engine. """
+    columns = []
+    for suffix, selection in occasions.items():
+        selection = dict(selection)
+        how = selection.pop('how', 'mean')
+        selected = select_scores(scores, **selection)
+        table = selected.groupby(['athlete', 'event'], observed=True)['score'].agg(how).unstack('event')
+        table = table.reindex(columns=EVENTS)
+        table.columns = [f'{event}_{suffix}' for event in EVENTS]
+        table[f'AA_{suffix}'] = table.sum(axis=1, skipna=False)
+        columns.append(table)
+
+    AA = pd.concat(columns, axis=1, join='inner').dropna()
+    AA.index = AA.index.astype(str)
+    latest_color = colors.drop_duplicates('athlete', keep='last').set_index('athlete')['color']
+    AA.insert(0, 'Color', latest_color.reindex(AA.index).to_numpy())
+    AA = AA.rename_axis('Name').reset_index()
+    AA.sort_values(by=f'AA_{next(iter(occasions))}', ascending=False, inplace=True)
+
+    return AA.reset_index(drop=True)
@@ -0,0 +1,211 @@
+""" Optional per-stage instrumentation for the team pipeline. Functions in gym.gym and gym.plot are wrapped with
+traced and report counts (teams scored, rows written, duplicate groups, bytes read/written) with count. While a
+session is open each call is recorded as a stage with its wall time, peak memory and counters, optionally under
+cProfile, and the session exports to JSON or the Chrome trace format. With no session open, traced calls go
+straight to the function and count returns immediately.
+
+    with instrument.session() as recorder:
+        run_team_combinations(AA)
+    recorder.write_json('trace.json') """
+import cProfile
+from contextlib import contextmanager
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# the open session's recorder, if any
+_recorder = None
+
+
+def _read_peak_rss():
+    """ Peak resident set size in bytes since it was last reset (Linux), or since the process started (other Unix
+    systems). Returns None where neither is available (Windows). """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def _reset_peak_rss():
+    """ Resets the kernel's peak resident set size where supported, so each stage reads its own peak. """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+class Recorder:
+    """ Collects one record per stage: name, parent stage, start offset and duration in seconds, peak memory in
+    bytes and counters. memory is 'rss' (peak resident memory, cheap; per stage where Linux lets the peak be
+    reset, otherwise the process peak so far; not recorded on Windows), 'tracemalloc' (peak bytes allocated by Python and NumPy, precise
+    but slower) or None; profile enables cProfile for the whole session. """
+
+    def __init__(self, memory='rss', profile=False):
+        self.memory = memory
+        self.records = []
+        self.profiler = cProfile.Profile() if profile else None
+        self._stack = []
+        self._start = time.perf_counter()
+
+    def _reset_peak(self):
+        if self.memory == 'rss':
+            _reset_peak_rss()
+        elif self.memory == 'tracemalloc':
+            tracemalloc.reset_peak()
+
+    def _read_peak(self):
+        if self.memory == 'rss':
+            return _read_peak_rss()
+        if self.memory == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[1]
+        return None
+
+    @contextmanager
+    def stage(self, name):
+        """ Records the enclosed block as a stage nested under any stage already open. """
+        record = {'name': name, 'parent': self._stack[-1]['name'] if self._stack else None,
+                  'start': time.perf_counter() - self._start, 'seconds': None, 'peak_bytes': None, 'counters': {}}
+        if self._stack:
+            # keep the outer stage's peak so far before resetting it for this one
+            self._fold_peak(self._stack[-1], self._read_peak())
+        self._reset_peak()
+        self._stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self._stack.pop()
+            # nested stages reset the peak, so the outer stage keeps the highest reading of its children
+            self._fold_peak(record, self._read_peak())
+            if self._stack:
+                self._fold_peak(self._stack[-1], record['peak_bytes'])
+            self.records.append(record)
+
+    @staticmethod
+    def _fold_peak(record, peak):
+        if peak is not None:
+            record['peak_bytes'] = max(peak, record['peak_bytes'] or 0)
+
+    def count(self, name, value=1):
+        """ Adds value to a counter of the innermost open stage. """
+        if self._stack:
+            counters = self._stack[-1]['counters']
+            counters[name] = counters.get(name, 0) + value
+
+    def summary(self):
+        """ Total seconds, calls and counters per stage name, in order of first completion. """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['name'], {'calls': 0, 'seconds': 0.0, 'peak_bytes': None, 'counters': {}})
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            if record['peak_bytes'] is not None:
+                total['peak_bytes'] = max(record['peak_bytes'], total['peak_bytes'] or 0)
+            for name, value in record['counters'].items():
+                total['counters'][name] = total['counters'].get(name, 0) + value
+
+        return totals
+
+    def write_json(self, file_path):
+        """ Writes every stage record and the per-stage summary as JSON. """
+        with open(file_path, 'w') as f:
+            json.dump({'memory': self.memory, 'stages': self.records, 'summary': self.summary()}, f, indent=2)
+
+    def write_chrome_trace(self, file_path):
+        """ Writes stages as complete events in the Chrome trace event format (chrome://tracing, Perfetto). """
+        events = [{'name': record['name'], 'ph': 'X', 'ts': record['start'] * 1e6, 'dur': record['seconds'] * 1e6,
+                   'pid': os.getpid(), 'tid': 0, 'args': {'peak_bytes': record['peak_bytes'], **record['counters']}}
+                  for record in self.records]
+        with open(file_path, 'w') as f:
+            json.dump({'traceEvents': events}, f)
+
+    def write_profile(self, file_path):
+        """ Dumps cProfile statistics (readable with pstats or snakeviz) when profiling was enabled. """
+        self.profiler.dump_stats(file_path)
+
+
+@contextmanager
+def session(memory='rss', profile=False):
+    """ Opens an instrumentation session and yields its Recorder. Sessions do not nest. """
+    global _recorder
+    if _recorder is not None:
+        raise RuntimeError('an instrumentation session is already open')
+    recorder = Recorder(memory, profile)
+    if memory == 'tracemalloc':
+        tracemalloc.start()
+    if recorder.profiler:
+        recorder.profiler.enable()
+    _recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _recorder = None
+        if recorder.profiler:
+            recorder.profiler.disable()
+        if memory == 'tracemalloc':
+            tracemalloc.stop()
+
+
+def traced(func):
+    """ Decorator recording each call as a stage named after the function while a session is open. """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _recorder is None:
+            return func(*args, **kwargs)
+        with _recorder.stage(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def stage(name):
+    """ Context manager recording a block as a stage while a session is open (does nothing otherwise). """
+    if _recorder is None:
+        return _NULL_STAGE
+    return _recorder.stage(name)
+
+
+def count(name, value=1):
+    """ Adds value to a counter of the innermost open stage while a session is open. """
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+def count_bytes(name, *file_paths):
+    """ Adds the total size of the given files (or directories of files) to a byte counter while a session is open. """
+    if _recorder is None:
+        return
+    total = 0
+    for file_path in file_paths:
+        if os.path.isdir(file_path):
+            total += sum(entry.stat().st_size for entry in os.scandir(file_path) if entry.is_file())
+        elif os.path.exists(file_path):
+            total += os.path.getsize(file_path)
+    _recorder.count(name, total)
+
+
+class _NullStage:
+    """ Reusable do-nothing context manager returned by stage when no session is open. """
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
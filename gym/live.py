@@ -0,0 +1,65 @@
+""" Incremental team scoring for live meets. Keeps every team's counting routines and score in memory and,
+when one routine score comes in, re-scores only the teams that include that athlete on that event, then
+updates the top team leaderboard and its duplicate groups. """
+import numpy as np
+from gym.engine import (EVENTS, TEAM_FINAL, athlete_postings, counting_team_scores, descending_order,
+                        duplicate_team_groups, score_matrix, score_teams, team_combinations, top_team_rows)
+
+
+class LiveTeamScores:
+    """ In-memory team rankings for one occasion and TeamFormat that can be updated one routine score at a time. """
+
+    def __init__(self, AA, occ, n=10, team_format=TEAM_FINAL):
+        self.names = AA['Name'].to_numpy()
+        self.n = n
+        self.count = team_format.count
+        # a writable copy (pandas may hand out read-only arrays), since updates change it in place
+        self.scores = np.array(score_matrix(AA, occ))
+        self.results = score_teams(self.scores, team_combinations(len(AA), team_format.team_size), count=self.count)
+        self.results.names = self.names
+        # rows of the teams each athlete belongs to, so an update only touches those teams
+        self.offsets, self.postings = athlete_postings(self.results.members, len(AA))
+        self.leaderboard = top_team_rows(self.results.team_scores, self.results.team_ids, n)
+
+    def update(self, name, event, score):
+        """ Records a new score for an athlete on an event. Re-scores that event for the C(n-1, team size - 1) teams
+        including the athlete and refreshes the leaderboard. Returns the rows of teams that were re-scored. """
+        athlete = int(np.flatnonzero(self.names == name)[0])
+        e = EVENTS.index(event)
+        previous = self.scores[athlete, e]
+        self.scores[athlete, e] = score
+        rows = self.postings[self.offsets[athlete]:self.offsets[athlete + 1]]
+
+        # new counting scores on this event only, ordered the same way as a full re-score
+        members = self.results.members[rows]
+        event_scores = self.scores[members, e]
+        order = descending_order(event_scores)[:, :self.count]
+        self.results.athletes[rows, e] = np.take_along_axis(members, order, axis=1)
+        self.results.scores[rows, e] = np.take_along_axis(event_scores, order, axis=1)
+        self.results.team_scores[rows] = counting_team_scores(self.scores, self.results.athletes[rows])
+
+        team_scores, team_ids = self.results.team_scores, self.results.team_ids
+        if score >= previous:
+            # only re-scored teams can have moved up, so they compete with the current leaderboard
+            candidates = np.union1d(self.leaderboard, top_team_rows(team_scores, team_ids, self.n, rows))
+            self.leaderboard = top_team_rows(team_scores, team_ids, self.n, candidates)
+        elif np.isin(self.leaderboard, rows).any():
+            # a leaderboard team went down, so anyone could replace it
+            self.leaderboard = top_team_rows(team_scores, team_ids, self.n)
+
+        return rows
+
+    def leaderboard_results(self):
+        """ Returns TeamResults for the leaderboard teams, best first. """
+        return self.results.take(self.leaderboard)
+
+    def duplicates(self):
+        """ Maps each leaderboard team with the lowest Team ID in its group to the other teams using the same
+        counting routines (the removed_teams layout used by build_top_team_table). Duplicates share a
+        team score, so only teams with a leaderboard score are compared. """
+        team_scores = self.results.team_scores
+        candidates = np.flatnonzero(np.isin(team_scores, team_scores[self.leaderboard]))
+        groups = duplicate_team_groups(self.results.athletes[candidates], self.results.team_ids[candidates])
+        leaders = set(self.results.team_ids[self.leaderboard].tolist())
+
+        return {group[0]: group[1:] for group in groups if leaders.intersection(group.tolist())}
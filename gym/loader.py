@@ -0,0 +1,74 @@
+""" Cached access to the competition results. The workbook is parsed at most once per version of the file: the
+merged roster and the athlete color/int maps are pickled under a key made from a hash of the workbook, and kept
+in memory for the rest of the process, so later calls (and later sessions) skip Excel parsing entirely. Nothing
+is read until load_results is first called. """
+import hashlib
+import os
+from os import makedirs, path
+import re
+import pandas as pd
+
+RESULTS_PATH = './gym/data/2023 US Championships Results.xlsx'
+CACHE_DIR = './gym/data/cache'
+
+# parsed results already loaded in this process, keyed by file path, modification time and size
+_loaded = {}
+
+
+def parse_results(results_path=RESULTS_PATH):
+    """ Imports and combines data for both days of competition, calculates average by athlete,
+    and returns the DataFrame along with dictionaries mapping each athlete to a color and an int. """
+    day1 = pd.read_excel(results_path, sheet_name='Prelims')
+    day2 = pd.read_excel(results_path, sheet_name='Finals')
+    # merge day 1 and day 2 results
+    AA = day1.merge(day2, how='inner', on='Name', suffixes=['_day1','_day2'])
+    # calculate averages for each athlete and event (including AA)
+    for event in ['AA', 'Vault', 'Bars', 'Beam', 'Floor']:
+        AA[f'{event}_avg'] = AA[[f'{event}_day1', f'{event}_day2']].mean(axis=1)
+    # sort DF by descending all around average
+    AA.sort_values(by='AA_avg', ascending=False, inplace=True)
+
+    # create dict mapping each athlete to a unique color
+    name_color = AA[['Name', 'Color']].set_index('Name')['Color'].to_dict()
+    # create dict to encode athlete names as ints to speed up later processes
+    name_int = AA.reset_index().set_index('Name')['index'].to_dict()
+
+    return AA, name_color, name_int
+
+
+def cache_path(results_path=RESULTS_PATH):
+    """ Pickle file holding the parsed results for the current contents of the workbook. """
+    with open(results_path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    return path.join(CACHE_DIR, f'{path.splitext(path.basename(results_path))[0]} {digest}.pkl')
+
+
+def _remove_stale_caches(results_path, current):
+    """ Deletes pickles of earlier versions of the workbook, keeping the current one. """
+    stale = re.compile(re.escape(path.splitext(path.basename(results_path))[0]) + r' [0-9a-f]{16}\.pkl')
+    for name in os.listdir(CACHE_DIR):
+        file_path = path.join(CACHE_DIR, name)
+        if stale.fullmatch(name) and file_path != current:
+            os.remove(file_path)
+
+
+def load_results(results_path=RESULTS_PATH):
+    """ Returns the merged results DataFrame and the athlete color and int dictionaries, parsing the workbook
+    only when neither this process nor the on-disk cache has seen the current version of it. The returned
+    objects are shared, so callers that modify them should copy first. """
+    stat = path.getmtime(results_path), path.getsize(results_path)
+    key = path.abspath(results_path)
+    if key in _loaded and _loaded[key][0] == stat:
+        return _loaded[key][1]
+
+    pickled = cache_path(results_path)
+    if path.exists(pickled):
+        results = pd.read_pickle(pickled)
+    else:
+        results = parse_results(results_path)
+        makedirs(CACHE_DIR, exist_ok=True)
+        pd.to_pickle(results, pickled)
+        _remove_stale_caches(results_path, pickled)
+    _loaded[key] = stat, results
+
+    return results
@@ -0,0 +1,263 @@
+""" Command-line runner for the whole pipeline (what US_Champs.ipynb does cell by cell) as a graph of stages:
+ingest the results workbook, score every team, find duplicate teams for each occasion and render the figures.
+Each stage records a fingerprint of its inputs (parameters, the source of the modules it runs and the contents of
+its input files) and of its outputs; a stage is re-run only when its inputs changed or its outputs are missing or
+were changed since, and stages whose dependencies are done run concurrently in worker processes. Only the standard
+library is imported here, so --help, --dry-run and runs with nothing to do start quickly; pandas, NumPy and the
+plotting libraries are imported by the stages that need them.
+
+Run from the repository root, e.g. python -m gym.pipeline --jobs 3, or python -m gym.pipeline dedup:Average
+to bring one stage (and whatever it depends on) up to date. """
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import hashlib
+import json
+import os
+from os import path
+import time
+
+# paths and occasion sheet names as in gym.loader, gym.store, gym.gym and gym.render (repeated here so the
+# runner does not import pandas to find them)
+RESULTS_PATH = './gym/data/2023 US Championships Results.xlsx'
+CACHE_DIR = './gym/data/cache'
+TEAMS_DIR = './gym/data/teams'
+DUPLICATES_DIR = './gym/data/duplicates'
+FIGURES_DIR = './gym/figures'
+SHEETS = ['Day 1', 'Day 2', 'Average']
+# fingerprints recorded by the last run of every stage
+STATE_PATH = './gym/data/pipeline_state.json'
+
+
+def _module(name):
+    """ Source file of a gym module, found without importing it. """
+    return path.join(path.dirname(path.abspath(__file__)), f'{name}.py')
+
+
+def ingest():
+    """ Parses the results workbook into the loader cache. """
+    from gym.loader import load_results
+    load_results(RESULTS_PATH)
+
+
+def score_teams(workers=None, chunk_size=None):
+    """ Scores every team for each occasion and writes the results store, index and Teams CSVs. """
+    from gym.gym import import_data, run_team_combinations
+    run_team_combinations(import_data(), workers=workers, chunk_size=chunk_size)
+
+
+def find_duplicates(sheet_name):
+    """ Groups teams sharing all counting routines for an occasion and saves the groups, which the team
+    figures then load instead of searching again. """
+    from gym.gym import find_same_3up
+    from gym.store import read_team_results, write_duplicates
+    results = read_team_results(sheet_name, columns=['team_ids', 'athletes', 'team_scores'])
+    write_duplicates(sheet_name, find_same_3up(results))
+
+
+def render(n=10, workers=None):
+    """ Renders every figure whose inputs changed (see gym.render). """
+    from gym.render import render_figures
+    render_figures(n=n, workers=workers)
+
+
+def pipeline_stages(n=10, workers=None, chunk_size=None):
+    """ Lists every stage as a dictionary with its name, the function and arguments running it, the stages it
+    depends on, its input files, the gym modules whose source it depends on and its output files (directories
+    stand for every file under them). """
+    team_files = [path.join(TEAMS_DIR, sheet_name) for sheet_name in SHEETS] + \
+                 [path.join(TEAMS_DIR, f'{sheet_name} Teams.csv') for sheet_name in SHEETS]
+    stages = [
+        {'name': 'ingest', 'func': ingest, 'args': (), 'deps': [], 'inputs': [RESULTS_PATH],
+         'code': ['loader'], 'outputs': [CACHE_DIR]},
+        {'name': 'teams', 'func': score_teams, 'args': (workers, chunk_size), 'deps': ['ingest'],
+         'inputs': [RESULTS_PATH], 'code': ['gym', 'engine', 'store', 'index', 'loader'], 'outputs': team_files},
+    ]
+    for sheet_name in SHEETS:
+        stages.append({'name': f'dedup:{sheet_name}', 'func': find_duplicates, 'args': (sheet_name,), 'deps': ['teams'],
+                       'inputs': [path.join(TEAMS_DIR, sheet_name), path.join(TEAMS_DIR, f'{sheet_name} Teams.csv')],
+                       'code': ['gym', 'engine', 'store'],
+                       'outputs': [path.join(DUPLICATES_DIR, f'{sheet_name}.json')]})
+    stages.append({'name': 'figures', 'func': render, 'args': (n, workers),
+                   'deps': [f'dedup:{sheet_name}' for sheet_name in SHEETS],
+                   'inputs': [RESULTS_PATH] + team_files + [path.join(DUPLICATES_DIR, f'{sheet_name}.json') for sheet_name in SHEETS],
+                   'code': ['render', 'plot', 'gym', 'engine', 'store', 'loader'], 'outputs': [FIGURES_DIR]})
+
+    return stages
+
+
+def _files(paths):
+    """ Every file named, or under a named directory, that exists, in sorted order. """
+    files = []
+    for file_path in paths:
+        if path.isdir(file_path):
+            files += [path.join(root, name) for root, _, names in os.walk(file_path) for name in names]
+        elif path.exists(file_path):
+            files.append(file_path)
+
+    return sorted(files)
+
+
+class Fingerprints:
+    """ Content hashes of files, recomputed only when a file's size or modification time changed, and the
+    input and output fingerprints recorded for every stage, saved as JSON between runs. """
+
+    def __init__(self, state_path=STATE_PATH):
+        self.state_path = state_path
+        self.state = {'files': {}, 'stages': {}}
+        if path.exists(state_path):
+            with open(state_path) as f:
+                self.state = json.load(f)
+
+    def file_hash(self, file_path):
+        stat = os.stat(file_path)
+        cached = self.state['files'].get(file_path)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.state['files'][file_path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+
+        return digest.hexdigest()
+
+    def inputs(self, stage):
+        """ Hash of a stage's parameters, the source of the modules it runs and its input files. """
+        digest = hashlib.sha256(repr((stage['name'], stage['args'])).encode())
+        for file_path in [_module('pipeline')] + [_module(name) for name in stage['code']] + _files(stage['inputs']):
+            digest.update(f'{file_path}\0{self.file_hash(file_path)}\0'.encode())
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def outputs(stage):
+        """ Hash of the names, sizes and modification times of a stage's output files (None if any is missing). """
+        files = _files(stage['outputs'])
+        if any(not path.exists(output) for output in stage['outputs']) or not files:
+            return None
+        digest = hashlib.sha256()
+        for file_path in files:
+            stat = os.stat(file_path)
+            digest.update(f'{file_path}\0{stat.st_size}\0{stat.st_mtime_ns}\0'.encode())
+
+        return digest.hexdigest()
+
+    def is_current(self, stage, inputs):
+        """ Checks whether a stage last ran with the same inputs and its outputs are untouched since. """
+        recorded = self.state['stages'].get(stage['name'])
+        return (recorded is not None and recorded['inputs'] == inputs
+                and recorded['outputs'] is not None and recorded['outputs'] == self.outputs(stage))
+
+    def record(self, stage, inputs):
+        self.state['stages'][stage['name']] = {'inputs': inputs, 'outputs': self.outputs(stage)}
+
+    def save(self):
+        os.makedirs(path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+
+
+def _required(stages, targets):
+    """ Names of the target stages and everything they depend on (every stage if no targets). """
+    by_name = {stage['name']: stage for stage in stages}
+    if not targets:
+        return set(by_name)
+    required = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise ValueError(f'unknown stage {name!r} (stages are {", ".join(by_name)})')
+        if name not in required:
+            required.add(name)
+            pending += by_name[name]['deps']
+
+    return required
+
+
+def _run(func, args):
+    """ Runs one stage and returns its wall time. Runs in a worker process. """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run_pipeline(targets=(), n=10, workers=None, chunk_size=None, jobs=None, force=False, dry_run=False, log=print):
+    """ Brings the target stages (all if none) and their dependencies up to date. Each stage is checked once its
+    dependencies are done, and stages that are not current run in up to jobs worker processes at a time (in this
+    process if jobs is 1). With dry_run, only reports which stages would run, as if every stage before them
+    had. Returns the names of the stages run (or that would run). """
+    stages = pipeline_stages(n, workers, chunk_size)
+    required = _required(stages, targets)
+    stages = [stage for stage in stages if stage['name'] in required]
+    fingerprints = Fingerprints()
+    done, ran = set(), []
+    # future of each stage running in the pool -> the stage and its input fingerprint
+    running = {}
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs != 1 and not dry_run else None
+    try:
+        while len(done) < len(stages):
+            for stage in stages:
+                name = stage['name']
+                if name in done or name in ran or not all(dep in done for dep in stage['deps']):
+                    continue
+                # a dry run cannot know what reruns upstream would write, so everything after a rerun is stale
+                stale = force or (dry_run and any(dep in ran for dep in stage['deps']))
+                inputs = fingerprints.inputs(stage)
+                if not stale and fingerprints.is_current(stage, inputs):
+                    log(f'{name}: up to date')
+                    done.add(name)
+                    continue
+                ran.append(name)
+                if dry_run:
+                    log(f'{name}: would run')
+                    done.add(name)
+                elif pool is None:
+                    log(f'{name}: running')
+                    seconds = _run(stage['func'], stage['args'])
+                    fingerprints.record(stage, inputs)
+                    log(f'{name}: done in {seconds:.1f} s')
+                    done.add(name)
+                else:
+                    log(f'{name}: running')
+                    running[pool.submit(_run, stage['func'], stage['args'])] = stage, inputs
+            if running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, inputs = running.pop(future)
+                    seconds = future.result()
+                    fingerprints.record(stage, inputs)
+                    log(f"{stage['name']}: done in {seconds:.1f} s")
+                    done.add(stage['name'])
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if not dry_run:
+            # keep the fingerprints of stages that finished even if another one failed
+            fingerprints.save()
+
+    return ran
+
+
+def main(argv=None):
+    stage_names = [stage['name'] for stage in pipeline_stages()]
+    parser = argparse.ArgumentParser(description='Run the pipeline stages whose inputs changed since their last run.',
+                                     epilog=f'stages: {", ".join(stage_names)}')
+    parser.add_argument('stages', nargs='*', metavar='stage', help='stages to bring up to date (default: all)')
+    parser.add_argument('--n', type=int, default=10, help='number of athletes/teams per chart')
+    parser.add_argument('--workers', type=int, help='worker processes within team scoring and rendering')
+    parser.add_argument('--chunk-size', type=int, help='stream team scoring in chunks of this many teams '
+                        '(without the athlete -> team index, so memory does not grow with the number of teams)')
+    parser.add_argument('--jobs', type=int, help='stages run at once (defaults to the number of CPUs; 1 runs in-process)')
+    parser.add_argument('--force', action='store_true', help='re-run every selected stage')
+    parser.add_argument('--dry-run', action='store_true', help='only list the stages that would run')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.stages if name not in stage_names]
+    if unknown:
+        parser.error(f'unknown stage(s) {", ".join(unknown)}')
+
+    run_pipeline(args.stages, args.n, args.workers, args.chunk_size, args.jobs, args.force, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,25 @@
-""" Functions to construct all data visualizations. These include All-Around, individual event, and team highest scoring data. """
+""" Functions to construct all data visualizations. These include All-Around, individual event, and team highest scoring data.
+Each figure is saved only if its file does not exist yet, unless overwrite is set. """
 import math
 from os import path
 from matplotlib import pyplot as plt
 from matplotlib import patches as mpatches
 import numpy as np
-import plotly.graph_objects as go
-from gym.gym import import_data, get_duplicates_for_top_team_table, flatten
+from gym import instrument
+from gym.gym import best_swaps, get_duplicates_for_top_team_table, flatten
+from gym.loader import load_results
 
 
-# import dictionary mapping athletes to colors
-_, name_color, _ = import_data(return_dicts=True)
+def athlete_colors():
+    """ Dictionary mapping athletes to colors, loaded (from cache when possible) on first use rather than on import. """
+    return load_results()[1]
+
+
+def __getattr__(name):
+    """ Keeps plot.name_color available without reading the results on import. """
+    if name == 'name_color':
+        return athlete_colors()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def patch_hatch(h):
@@ -22,7 +32,8 @@ def patch_color(c):
     return mpatches.Patch(color=c)
 
 
-def athlete_legend(colors, names):
+@instrument.traced
+def athlete_legend(colors, names, overwrite=False):
     """ Create a standalone legend for the univeral athlete color-coding. """
     _, ax = plt.subplots()
     handles = [patch_color(colors[i]) for i in range(len(colors))]
@@ -32,11 +43,12 @@ def athlete_legend(colors, names):
     ax.axis('off')
 
     # save if not already generated/to regenerate
-    if not path.exists(r'./gym/figures/Athlete Legend'):
+    if overwrite or not path.exists(r'./gym/figures/Athlete Legend.png'):
         plt.savefig(r'./gym/figures/Athlete Legend')
 
 
-def AA_slope_plot(names, colors, AA_day1, AA_day2, n=10):
+@instrument.traced
+def AA_slope_plot(names, colors, AA_day1, AA_day2, n=10, overwrite=False):
     """ Create slope plot of top n top average all-arounders to show trends in performance across the days. """
     fig, ax = plt.subplots()
 
@@ -50,11 +62,12 @@ def AA_slope_plot(names, colors, AA_day1, AA_day2, n=10):
     ax.set_xticklabels(['Day 1', 'Day 2'])
 
     # save if not already generated/to regenerate
-    if not path.exists(f'./gym/figures/AA/Top {n} Average AA Performances Across Days'):
+    if overwrite or not path.exists(f'./gym/figures/AA/Top {n} Average AA Performances Across Days.png'):
         plt.savefig(f'./gym/figures/AA/Top {n} Average AA Performances Across Days')
 
 
-def AA_avg_bar_chart(AA, n=10):
+@instrument.traced
+def AA_avg_bar_chart(AA, n=10, overwrite=False):
     """ Create bar plot of the top n average All Around scores,
     color-coded by universal athlete colors and hatch-coded by event. """
     _, ax = plt.subplots(figsize=(10,10))
@@ -79,11 +92,12 @@ def AA_avg_bar_chart(AA, n=10):
     ax.legend(handles=handles, labels=['Vault', 'Bars', 'Beam', 'Floor'], fontsize='25', loc='right', bbox_to_anchor=[1.35,0.4])
 
     # save if not already generated/to regenerate
-    if not path.exists(f'./gym/figures/AA/Top {n} Average AA Performances'):
+    if overwrite or not path.exists(f'./gym/figures/AA/Top {n} Average AA Performances.png'):
         plt.savefig(f'./gym/figures/AA/Top {n} Average AA Performances')
 
 
-def AA_by_day_bar_chart(AA, n=10):
+@instrument.traced
+def AA_by_day_bar_chart(AA, n=10, overwrite=False):
     """ Create bar plots of the top n All Arounders for each night of competition,
     color-coded by universal athlete colors and hatch-coded by event. """
     fig = plt.figure(figsize=(20, 10))
@@ -116,11 +130,12 @@ def AA_by_day_bar_chart(AA, n=10):
     ax.axis('off')
 
     # save if not already generated/to regenerate
-    if not path.exists(f'./gym/figures/AA/Top {n} AA Performances by Day'):
+    if overwrite or not path.exists(f'./gym/figures/AA/Top {n} AA Performances by Day.png'):
         plt.savefig(f'./gym/figures/AA/Top {n} AA Performances by Day')
 
 
-def event_by_day_bar_chart(AA, event, n=10):
+@instrument.traced
+def event_by_day_bar_chart(AA, event, n=10, overwrite=False):
     """ Create bar plots of the top n event scores for each night of competition,
     color-coded by universal athlete colors. """
     _, ax = plt.subplots(1,2,figsize=(20, 10))
@@ -139,11 +154,12 @@ def event_by_day_bar_chart(AA, event, n=10):
         ax[i].set_ylim([12,16])
 
     # save if not already generated/to regenerate
-    if not path.exists(f'./gym/figures/{event}/Top {n} {event} Performances Across Days'):
+    if overwrite or not path.exists(f'./gym/figures/{event}/Top {n} {event} Performances Across Days.png'):
         plt.savefig(f'./gym/figures/{event}/Top {n} {event} Performances Across Days')
 
 
-def event_avg_bar_chart(AA, event, n=10):
+@instrument.traced
+def event_avg_bar_chart(AA, event, n=10, overwrite=False):
     """ Create bar plot of the top n average event scores,
     color-coded by universal athlete colors. """
     _, ax = plt.subplots(figsize=(8, 6))
@@ -168,17 +184,19 @@ def event_avg_bar_chart(AA, event, n=10):
     ax.set_ylim([12,16])
 
     # save if not already generated/to regenerate
-    if not path.exists(f'./gym/figures/{event}/Top {n} Average {event} Performances'):
+    if overwrite or not path.exists(f'./gym/figures/{event}/Top {n} Average {event} Performances.png'):
         plt.savefig(f'./gym/figures/{event}/Top {n} Average {event} Performances')
 
-def team_scores_bar_chart(team_data, occ, n=10):
+@instrument.traced
+def team_scores_bar_chart(team_data, occ, n=10, name_color=None, overwrite=False):
     """ Create bar plot of the top n team scores of all possible team iterations for occasion specified,
-    color-coded by universal athlete colors and hatch-coded by event. """
+    color-coded by universal athlete colors (or the given name_color dictionary) and hatch-coded by event. """
     fig, axs = plt.subplots(figsize=(20, 10), nrows=1, ncols=2, width_ratios=[3,1])
+    name_color = name_color or athlete_colors()
 
     team_data.set_index('Team ID', inplace=True)
     # calculate team score for each team and add to df
-    team_data['Team Score'] = np.repeat(team_data.groupby(team_data.index)['Score'].sum().values, 12)
+    team_data['Team Score'] = team_data.groupby(level=0)['Score'].transform('sum')
     max_score = team_data['Team Score'].max()
     # sort values by descending team score while preserving index
     team_data = team_data.sort_values(by = ['Team Score', 'Team ID'], ascending = [False, True])
@@ -194,8 +212,8 @@ def team_scores_bar_chart(team_data, occ, n=10):
     ax = fig.add_subplot(axs[0])
     # iterate through each event
     for i, event in enumerate(['Vault', 'Bars', 'Beam', 'Floor']):
-      # iterate through top 3 scoring athletes on given team and event
-        for ii in range(1,4):
+      # iterate through top 3 (or however many count) scoring athletes on given team and event
+        for ii in range(1, team_data['Score_Rank'].max() + 1):
             x_up = team_data[(team_data['Event'] == event) & (team_data['Score_Rank'] == ii)]
             athletes = x_up['Name']
             # check color dictionary to get colors to color code by athlete
@@ -222,14 +240,19 @@ def team_scores_bar_chart(team_data, occ, n=10):
     plt.axis('off')
 
     # save if not already generated/to regenerate
-    if not path.exists(f'./gym/figures/Team/{occ} Top {n} Team Scores'):
+    if overwrite or not path.exists(f'./gym/figures/Team/{occ} Top {n} Team Scores.png'):
         plt.savefig(f'./gym/figures/Team/{occ} Top {n} Team Scores')
 
     return top_team_ids
 
 
-def build_top_team_table(top_team_ids, removed_teams, team_df, occ, annotations_y=0):
-    """ Build a table of Team IDs with corresponding athlete names to accompany team scores bar chart. """
+@instrument.traced
+def build_top_team_table(top_team_ids, removed_teams, team_df, occ, annotations_y=0, show=True, swaps=None, overwrite=False):
+    """ Build a table of Team IDs with corresponding athlete names to accompany team scores bar chart.
+    Optionally adds each team's best single-athlete swap from swap_analysis output, and skips displaying
+    the table (for batch rendering). """
+    # plotly is slow to import and only needed for tables
+    import plotly.graph_objects as go
     # get exceptions to note (cases where one team member could be swapped for other athletes)
     duplicate_team_ids, team_constants, team_variables = get_duplicates_for_top_team_table(top_team_ids, removed_teams, team_df)
     # create option for annotations to note exceptions
@@ -250,6 +273,11 @@ def build_top_team_table(top_team_ids, removed_teams, team_df, occ, annotations_
                 annotations += ', '.join(team_variables[i][ii*7:ii*7+7])
                 annotations += ', <br>'
             annotations += ', '.join(team_variables[i][ii*7+7:]) + '<br>'
+    # note the substitution costing each team the least (added after the duplicate notes, which compare names)
+    if swaps is not None:
+        best = best_swaps(swaps, per_member=False).set_index('Team ID')
+        chart['Best Swap'] = [f"{best.at[team_id, 'Out']} → {best.at[team_id, 'In']} ({best.at[team_id, 'Delta']:+.3f})"
+                              for team_id in chart.index]
     chart.reset_index(inplace=True)
 
     # create table
@@ -261,7 +289,8 @@ def build_top_team_table(top_team_ids, removed_teams, team_df, occ, annotations_
 
     # save if not already generated/to regenerate
     n = len(top_team_ids)
-    if not path.exists(f'./gym/figures/Team/{occ} Top {n} Team Members'):
+    if overwrite or not path.exists(f'./gym/figures/Team/{occ} Top {n} Team Members.png'):
         fig.write_image(f'./gym/figures/Team/{occ} Top {n} Team Members.png')
 
-    fig.show()
+    if show:
+        fig.show()
@@ -0,0 +1,177 @@
+""" Batch rendering of the full figure set. Each figure is keyed by a hash of its inputs (the slice of data it plots,
+its parameters and the source of the gym modules drawing it); figures whose key matches the one recorded at their last
+render are skipped and the rest are drawn across a pool of worker processes with a non-interactive backend.
+
+Run from the repository root, e.g. python -m gym.render --workers 4 """
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+from os import path
+import pandas as pd
+from gym import plot
+from gym.engine import EVENTS
+from gym.gym import OCCASIONS, import_counting_scores, import_data, swap_analysis
+from gym.store import duplicates_path, has_duplicates, has_team_results, store_path
+
+FIGURES_DIR = './gym/figures'
+# output path -> input key of every figure as last rendered
+MANIFEST_PATH = path.join(FIGURES_DIR, 'render_manifest.json')
+# occasion sheet names with the vertical offset of each team table's annotations
+TEAM_TABLE_ANNOTATIONS_Y = {'Day 1': -0.03, 'Day 2': 0, 'Average': -0.12}
+# gym modules whose source each kind of figure depends on: the plots themselves, and for team figures also the
+# scoring, duplicate search and swap analysis behind them
+FIGURE_CODE = ['plot']
+TEAM_FIGURE_CODE = ['render', 'plot', 'gym', 'engine', 'store']
+
+
+def render_team_figures(sheet_name, n=10, annotations_y=0, AA=None, overwrite=False):
+    """ Draws the team scores bar chart and its team member table for the occasion specified by sheet name,
+    noting each top team's best swap when given the roster. """
+    scores, teams, removed_teams = import_counting_scores(sheet_name)
+    top_team_ids = plot.team_scores_bar_chart(scores, sheet_name, n, overwrite=overwrite)
+    swaps = swap_analysis(AA, OCCASIONS[sheet_name], top_team_ids) if AA is not None else None
+    plot.build_top_team_table(top_team_ids, removed_teams, teams, sheet_name, annotations_y, show=False, swaps=swaps,
+                              overwrite=overwrite)
+
+
+def _team_inputs(sheet_name):
+    """ Files the team figures for an occasion are drawn from. """
+    if has_team_results(sheet_name):
+        directory = store_path(sheet_name)
+        files = [path.join(directory, name) for name in sorted(os.listdir(directory)) if not name.startswith('index_')]
+        # saved duplicate groups are used in place of searching the results again
+        if has_duplicates(sheet_name):
+            files.append(duplicates_path(sheet_name))
+        return files
+    return [r'./gym/data/Highest Scoring Teams.xlsx', f'./gym/data/teams/{sheet_name} Teams.csv']
+
+
+def _module(name):
+    """ Source file of a gym module. """
+    return path.join(path.dirname(path.abspath(__file__)), f'{name}.py')
+
+
+def figure_specs(AA, n=10):
+    """ Lists every figure as a dictionary with the drawing function, its arguments, the PNG files it writes and
+    what it depends on (columns of AA, the gym modules behind it, and input files for team figures). """
+    specs = [
+        {'func': plot.athlete_legend, 'args': (AA['Color'], AA['Name']),
+         'outputs': [f'{FIGURES_DIR}/Athlete Legend.png'], 'columns': ['Name', 'Color']},
+        {'func': plot.AA_slope_plot, 'args': (AA['Name'], AA['Color'], AA['AA_day1'], AA['AA_day2'], n),
+         'outputs': [f'{FIGURES_DIR}/AA/Top {n} Average AA Performances Across Days.png'],
+         'columns': ['Name', 'Color', 'AA_day1', 'AA_day2']},
+        {'func': plot.AA_avg_bar_chart, 'args': (AA, n), 'outputs': [f'{FIGURES_DIR}/AA/Top {n} Average AA Performances.png'],
+         'columns': ['Name', 'Color', 'AA_avg'] + [f'{event}_avg' for event in EVENTS]},
+        {'func': plot.AA_by_day_bar_chart, 'args': (AA, n), 'outputs': [f'{FIGURES_DIR}/AA/Top {n} AA Performances by Day.png'],
+         'columns': ['Name', 'Color'] + [f'{event}_{day}' for day in ['day1', 'day2'] for event in ['AA'] + EVENTS]},
+    ]
+    for event in EVENTS:
+        columns = ['Name', 'Color', f'{event}_day1', f'{event}_day2', f'{event}_avg']
+        specs.append({'func': plot.event_by_day_bar_chart, 'args': (AA, event, n), 'columns': columns,
+                      'outputs': [f'{FIGURES_DIR}/{event}/Top {n} {event} Performances Across Days.png']})
+        specs.append({'func': plot.event_avg_bar_chart, 'args': (AA, event, n), 'columns': columns,
+                      'outputs': [f'{FIGURES_DIR}/{event}/Top {n} Average {event} Performances.png']})
+    for sheet_name, annotations_y in TEAM_TABLE_ANNOTATIONS_Y.items():
+        specs.append({'func': render_team_figures, 'args': (sheet_name, n, annotations_y, AA),
+                      'outputs': [f'{FIGURES_DIR}/Team/{sheet_name} Top {n} Team Scores.png',
+                                  f'{FIGURES_DIR}/Team/{sheet_name} Top {n} Team Members.png'],
+                      # team charts also use every athlete's color, and swaps the occasion's scores
+                      'columns': ['Name', 'Color'] + [f'{event}_{OCCASIONS[sheet_name]}' for event in EVENTS],
+                      'files': _team_inputs(sheet_name),
+                      'code': TEAM_FIGURE_CODE})
+
+    return specs
+
+
+def figure_key(spec, AA):
+    """ Hash of everything a figure depends on: the function drawing it and the source of the gym modules behind
+    it (gym.plot unless the spec names others), its scalar parameters, the AA columns it plots and the contents
+    of any input files. """
+    digest = hashlib.sha256(f"{spec['func'].__module__}.{spec['func'].__qualname__}".encode())
+    for name in spec.get('code', FIGURE_CODE):
+        with open(_module(name), 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    digest.update(repr([arg for arg in spec['args'] if not isinstance(arg, (pd.DataFrame, pd.Series))]).encode())
+    digest.update(pd.util.hash_pandas_object(AA[spec['columns']]).to_numpy().tobytes())
+    for file in spec.get('files', []):
+        with open(file, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+
+    return digest.hexdigest()
+
+
+def _render(func, args):
+    """ Draws one figure over its previous file and closes it. Runs in a worker process. """
+    func(*args, overwrite=True)
+    plot.plt.close('all')
+
+
+def _use_agg():
+    """ Switches worker processes to the non-interactive backend. """
+    plot.plt.switch_backend('Agg')
+
+
+def render_figures(AA=None, n=10, workers=None, force=False):
+    """ Renders every figure whose inputs changed since it was last rendered (or whose file is missing), across
+    a pool of worker processes (in this process if workers is 1). Returns the list of files written. """
+    AA = import_data() if AA is None else AA
+    manifest = {}
+    if path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+
+    stale = []
+    for spec in figure_specs(AA, n):
+        if any(not path.exists(file) for file in spec.get('files', [])):
+            # nothing to draw team figures from until run_team_combinations has been run
+            continue
+        key = figure_key(spec, AA)
+        if not force and all(path.exists(output) and manifest.get(output) == key for output in spec['outputs']):
+            continue
+        stale.append((spec, key))
+
+    # figures are drawn over their previous files, so a failed render leaves those in place; modification
+    # times tell which files were actually written
+    written_before = {output: os.stat(output).st_mtime_ns for spec, _ in stale for output in spec['outputs']
+                      if path.exists(output)}
+    try:
+        if workers == 1:
+            backend = plot.plt.get_backend()
+            _use_agg()
+            try:
+                for spec, _ in stale:
+                    _render(spec['func'], spec['args'])
+            finally:
+                plot.plt.switch_backend(backend)
+        elif stale:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg) as pool:
+                list(pool.map(_render, [spec['func'] for spec, _ in stale], [spec['args'] for spec, _ in stale]))
+    finally:
+        # only record figures that were actually written, so failed ones are retried next time
+        written = []
+        for spec, key in stale:
+            for output in spec['outputs']:
+                if path.exists(output) and os.stat(output).st_mtime_ns != written_before.get(output):
+                    manifest[output] = key
+                    written.append(output)
+        with open(MANIFEST_PATH, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render figures whose inputs changed since the last render.')
+    parser.add_argument('--n', type=int, default=10, help='number of athletes/teams per chart')
+    parser.add_argument('--workers', type=int, help='worker processes (defaults to the number of CPUs)')
+    parser.add_argument('--force', action='store_true', help='re-render every figure')
+    args = parser.parse_args(argv)
+
+    for output in render_figures(n=args.n, workers=args.workers, force=args.force):
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+""" Monte Carlo team selection. Samples plausible scores for every athlete and event from the spread between
+the two days of competition, finds the highest scoring 5-member team in each scenario with batched array
+operations over blocks of scenarios x teams, and reports how often each athlete and team is selected. """
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import math
+import numpy as np
+import pandas as pd
+from gym.engine import EVENTS, team_combinations, unrank_combinations
+
+# upper bound on the scenarios x teams cells scored per vectorized step (bounds the size of temporary arrays)
+SIM_CHUNK_CELLS = 1 << 16
+# sampled scores are kept in fixed point (thousandths of a point, uint16)
+SIM_SCORE_SCALE = 1000
+# spread floor, so athletes who scored the same on both days are not treated as certain to repeat it
+MIN_SPREAD = 0.1
+
+
+def score_spread(AA, min_spread=MIN_SPREAD):
+    """ Returns athlete x event matrices of mean scores (the 2-day average) and standard deviations
+    (the sample deviation of the two days, at least min_spread), in the same row order as AA. """
+    day1 = AA[[f'{event}_day1' for event in EVENTS]].to_numpy(dtype=float)
+    day2 = AA[[f'{event}_day2' for event in EVENTS]].to_numpy(dtype=float)
+    # the sample standard deviation of two observations is their difference over sqrt(2)
+    spread = np.maximum(np.abs(day1 - day2) / np.sqrt(2), min_spread)
+
+    return (day1 + day2) / 2, spread
+
+
+def sample_scores(mean, spread, num_scenarios, seed=None):
+    """ Draws num_scenarios normally distributed score matrices, rounded to thousandths and kept in fixed
+    point (uint16), shape (scenarios, athletes, events). """
+    rng = np.random.default_rng(seed)
+    samples = rng.normal(mean, spread, size=(num_scenarios,) + np.shape(mean))
+
+    return np.clip(np.rint(samples * SIM_SCORE_SCALE), 0, np.iinfo(np.uint16).max).astype(np.uint16)
+
+
+def scenario_team_scores(samples, combos, count=3):
+    """ Team scores in thousandths for every team and scenario, shape (teams, scenarios), from samples laid
+    out as (events, athletes, scenarios) so each member lookup copies whole rows. The top count scores on an
+    event are the sum over all members minus the lowest ones, which needs fewer comparisons than sorting.
+    Event sums wrap around in uint16, but the top 3 of an event always fit, so the result is exact. """
+    team_size = combos.shape[1]
+    totals = np.zeros((len(combos), samples.shape[2]), dtype=np.int32)
+    for event in samples:
+        event_total = np.zeros(totals.shape, dtype=samples.dtype)
+        # running lowest team_size - count scores of the members seen so far
+        lowest = []
+        for i in range(team_size):
+            value = event[combos[:, i]]
+            event_total += value
+            for j in range(len(lowest)):
+                lowest[j], value = np.minimum(lowest[j], value), np.maximum(lowest[j], value)
+            if len(lowest) < team_size - count:
+                lowest.append(value)
+        for value in lowest:
+            event_total -= value
+        totals += event_total
+
+    return totals
+
+
+def _best_team_ids(samples, num_athletes, team_size=5, chunk_cells=SIM_CHUNK_CELLS):
+    """ Finds the Team ID of the highest scoring team in each scenario (ties going to the lower Team ID,
+    as in the team rankings), stepping over Team ID ranges so memory stays bounded for any roster size. """
+    num_scenarios = len(samples)
+    num_teams = math.comb(num_athletes, team_size)
+    samples = np.ascontiguousarray(np.transpose(samples, (2, 1, 0)))
+    team_chunk = max(1, chunk_cells // max(1, num_scenarios))
+    best_scores = np.full(num_scenarios, -1, dtype=np.int32)
+    best_ids = np.zeros(num_scenarios, dtype=np.int64)
+    for lo in range(0, num_teams, team_chunk):
+        hi = min(lo + team_chunk, num_teams)
+        totals = scenario_team_scores(samples, team_combinations(num_athletes, team_size, lo, hi))
+        # argmax takes the first (lowest Team ID) of any tied teams; later chunks must be strictly better
+        rows = np.argmax(totals, axis=0)
+        scores = totals[rows, np.arange(num_scenarios)]
+        better = scores > best_scores
+        best_scores[better] = scores[better]
+        best_ids[better] = lo + rows[better]
+
+    return best_ids
+
+
+def simulate_best_teams(samples, team_size=5, workers=None, chunk_cells=SIM_CHUNK_CELLS, scenario_chunk=256):
+    """ Finds the Team ID of the highest scoring team for each sampled scenario. Scenarios are split into
+    blocks of scenario_chunk (optionally scored across a pool of worker processes) and each block is scored
+    against chunks of teams, so no more than about chunk_cells team scores are held at once per process. """
+    num_athletes = samples.shape[1]
+    blocks = [samples[lo:lo + scenario_chunk] for lo in range(0, len(samples), scenario_chunk)]
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_best_team_ids, blocks, repeat(num_athletes), repeat(team_size), repeat(chunk_cells)))
+    else:
+        results = [_best_team_ids(block, num_athletes, team_size, chunk_cells) for block in blocks]
+
+    return np.concatenate(results)
+
+
+def simulate_team_selection(AA, num_scenarios=10000, min_spread=MIN_SPREAD, seed=None, workers=None, n=10):
+    """ Samples num_scenarios sets of scores from each athlete's spread between the two days and finds the
+    highest scoring 5-member team in each. Returns a dataframe of each athlete's selection probability
+    (the share of scenarios where they are on the best team) and a dataframe of the n teams selected most
+    often with Team ID, selection probability, and members. """
+    names = AA['Name'].to_numpy()
+    mean, spread = score_spread(AA, min_spread)
+    best_ids = simulate_best_teams(sample_scores(mean, spread, num_scenarios, seed), workers=workers)
+
+    team_ids, counts = np.unique(best_ids, return_counts=True)
+    members = unrank_combinations(team_ids, len(AA))
+    athlete_counts = np.bincount(np.ravel(members), weights=np.repeat(counts, members.shape[1]), minlength=len(AA))
+    athletes = pd.DataFrame({'Name': names, 'Selection Probability': athlete_counts / num_scenarios})
+    athletes = athletes.sort_values(by='Selection Probability', ascending=False, kind='stable').reset_index(drop=True)
+
+    # most often selected teams first (then by Team ID)
+    order = np.lexsort((team_ids, -counts))[:n]
+    teams = pd.DataFrame({'Team ID': team_ids[order], 'Selection Probability': counts[order] / num_scenarios})
+    for i in range(members.shape[1]):
+        teams[f'Member {i+1}'] = names[members[order, i]]
+
+    return athletes, teams
@@ -0,0 +1,142 @@
+""" Columnar on-disk store for team scoring results. Each occasion is saved as a directory of NumPy .npy
+files (one per TeamResults column, with athletes int-coded against a saved name list) that are memory-mapped
+on read, replacing the Highest Scoring Teams.xlsx round trip. """
+import json
+from os import makedirs, path, remove
+import numpy as np
+from gym.engine import EVENTS, TeamResults
+from gym.index import TeamIndex
+
+STORE_DIR = './gym/data/teams'
+# one file per TeamResults array (see gym.engine.TeamResults for layouts and dtypes)
+COLUMNS = ['team_ids', 'members', 'athletes', 'scores', 'team_scores']
+# one file per TeamIndex array, saved next to the results they index
+INDEX_COLUMNS = ['order', 'member_bits', 'counting_bits']
+# groups of teams sharing all counting routines, one JSON file per occasion (kept apart from the results so
+# saving them leaves the results directory untouched)
+DUPLICATES_DIR = './gym/data/duplicates'
+
+
+def store_path(sheet_name):
+    """ Directory holding the stored results for the occasion specified by sheet name. """
+    return path.join(STORE_DIR, sheet_name)
+
+
+def has_team_results(sheet_name):
+    """ Checks whether results for the occasion have been written to the store. """
+    return all(path.exists(path.join(store_path(sheet_name), f'{column}.npy')) for column in COLUMNS)
+
+
+def write_team_results(sheet_name, results):
+    """ Writes every column of TeamResults for an occasion in bulk, along with the athlete names the codes refer to. """
+    directory = store_path(sheet_name)
+    makedirs(directory, exist_ok=True)
+    for column in COLUMNS:
+        np.save(path.join(directory, f'{column}.npy'), getattr(results, column))
+    with open(path.join(directory, 'names.json'), 'w') as f:
+        json.dump({'names': [str(name) for name in results.names], 'events': EVENTS}, f)
+
+
+def read_team_results(sheet_name, columns=COLUMNS):
+    """ Memory-maps only the requested columns for an occasion (others are left as None).
+    Returns TeamResults with athlete names attached. """
+    directory = store_path(sheet_name)
+    arrays = {column: np.load(path.join(directory, f'{column}.npy'), mmap_mode='r') if column in columns else None
+              for column in COLUMNS}
+    with open(path.join(directory, 'names.json')) as f:
+        names = np.array(json.load(f)['names'], dtype=object)
+
+    return TeamResults(**arrays, names=names)
+
+
+def has_team_index(sheet_name):
+    """ Checks whether the athlete -> team index for the occasion has been written to the store. """
+    return all(path.exists(path.join(store_path(sheet_name), f'index_{column}.npy')) for column in INDEX_COLUMNS)
+
+
+def write_team_index(sheet_name, index):
+    """ Writes every array of a TeamIndex for an occasion next to its results. """
+    directory = store_path(sheet_name)
+    makedirs(directory, exist_ok=True)
+    for column in INDEX_COLUMNS:
+        np.save(path.join(directory, f'index_{column}.npy'), getattr(index, column))
+
+
+def remove_team_index(sheet_name):
+    """ Deletes the athlete -> team index for an occasion, if any, so results written without one are not
+    queried through an index of earlier results. """
+    for column in INDEX_COLUMNS:
+        file_path = path.join(store_path(sheet_name), f'index_{column}.npy')
+        if path.exists(file_path):
+            remove(file_path)
+
+
+def read_team_index(sheet_name):
+    """ Memory-maps the athlete -> team index for an occasion. Returns TeamIndex. """
+    directory = store_path(sheet_name)
+    return TeamIndex(*(np.load(path.join(directory, f'index_{column}.npy'), mmap_mode='r') for column in INDEX_COLUMNS))
+
+
+def duplicates_path(sheet_name):
+    """ JSON file holding the duplicate team groups found for the occasion specified by sheet name. """
+    return path.join(DUPLICATES_DIR, f'{sheet_name}.json')
+
+
+def write_duplicates(sheet_name, groups):
+    """ Saves duplicate team groups (lists of Team IDs, as from find_same_3up) in order, mapping the first
+    team of each group to the others. """
+    makedirs(DUPLICATES_DIR, exist_ok=True)
+    with open(duplicates_path(sheet_name), 'w') as f:
+        json.dump({str(group[0]): [int(team_id) for team_id in group[1:]] for group in groups}, f)
+
+
+def has_duplicates(sheet_name):
+    """ Checks whether duplicate team groups were saved for an occasion since its results were last written. """
+    file_path = duplicates_path(sheet_name)
+    results_path = path.join(store_path(sheet_name), 'team_ids.npy')
+    return path.exists(file_path) and path.exists(results_path) and path.getmtime(file_path) >= path.getmtime(results_path)
+
+
+def read_duplicates(sheet_name):
+    """ Loads the saved duplicate team groups for an occasion, or returns None if none are saved (see has_duplicates). """
+    if not has_duplicates(sheet_name):
+        return None
+    with open(duplicates_path(sheet_name)) as f:
+        return [np.array([int(team_id)] + others, dtype=np.int64) for team_id, others in json.load(f).items()]
+
+
+class TeamResultsWriter:
+    """ Writes TeamResults for an occasion chunk by chunk, in Team ID order, appending each chunk to .npy files
+    whose headers already give the final number of teams, so no more than one chunk is held in memory. The
+    files are identical to write_team_results on the joined results. """
+
+    def __init__(self, sheet_name, num_teams, names):
+        self.directory = store_path(sheet_name)
+        self.num_teams = num_teams
+        self.names = names
+        self.written = 0
+        self.files = None
+
+    def write(self, results):
+        """ Appends the next chunk of teams. """
+        if self.files is None:
+            # dtypes and row shapes come from the first chunk
+            makedirs(self.directory, exist_ok=True)
+            self.files = {}
+            for column in COLUMNS:
+                array = getattr(results, column)
+                header = np.lib.format.header_data_from_array_1_0(array)
+                header['shape'] = (self.num_teams,) + array.shape[1:]
+                self.files[column] = open(path.join(self.directory, f'{column}.npy'), 'wb')
+                np.lib.format.write_array_header_1_0(self.files[column], header)
+        for column, f in self.files.items():
+            f.write(np.ascontiguousarray(getattr(results, column)).tobytes())
+        self.written += len(results)
+
+    def close(self):
+        """ Closes every column and writes the athlete names the codes refer to. """
+        for f in (self.files or {}).values():
+            f.close()
+        self.files = None
+        with open(path.join(self.directory, 'names.json'), 'w') as f:
+            json.dump({'names': [str(name) for name in self.names], 'events': EVENTS}, f)